@@ -0,0 +1,131 @@
+"""Controle de admissão das gerações: limite de concorrência, fila FIFO e voo único.
+
+No máximo GERACAO_CONCORRENCIA chamadas ao Flowise rodam ao mesmo tempo por
+processo; as seguintes esperam numa fila por ordem de chegada, de até
+GERACAO_FILA_MAX posições (acima disso, FilaCheia). Pedidos idênticos já em
+andamento (mesma chave) não saem de novo: esperam a chamada em curso e recebem
+o mesmo resultado, inclusive o texto parcial do streaming.
+"""
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+import metricas
+
+GERACAO_CONCORRENCIA = int(os.getenv("GERACAO_CONCORRENCIA", "4"))
+GERACAO_FILA_MAX = int(os.getenv("GERACAO_FILA_MAX", "40"))
+
+
+class FilaCheia(RuntimeError):
+    """A fila de gerações está no limite."""
+
+
+class Portao:
+    """Semáforo com fila FIFO visível: quem espera sabe a própria posição."""
+
+    def __init__(self, limite: int = GERACAO_CONCORRENCIA, fila_max: int = GERACAO_FILA_MAX):
+        self.limite = limite
+        self.fila_max = fila_max
+        self._cond = threading.Condition()
+        self._ativos = 0
+        self._fila = deque()
+
+    @property
+    def ativos(self) -> int:
+        return self._ativos
+
+    @property
+    def na_fila(self) -> int:
+        return len(self._fila)
+
+    @contextmanager
+    def entrar(self, ao_aguardar=None):
+        """Ocupa uma vaga; enquanto espera, chama `ao_aguardar(posicao)` a cada mudança (0 ao entrar)."""
+        with metricas.span("flowise", "fila") as s, self._cond:
+            if self._ativos >= self.limite or self._fila:
+                if len(self._fila) >= self.fila_max:
+                    raise FilaCheia(f"Há {len(self._fila)} gerações na fila; tente de novo em alguns minutos.")
+                vez = object()
+                self._fila.append(vez)
+                s.medir(enfileirados=1, posicao_na_chegada=len(self._fila))
+                try:
+                    posicao = None
+                    while self._fila[0] is not vez or self._ativos >= self.limite:
+                        atual = self._fila.index(vez) + 1
+                        if atual != posicao and ao_aguardar is not None:
+                            ao_aguardar(atual)
+                        posicao = atual
+                        self._cond.wait()
+                finally:
+                    self._fila.remove(vez)
+                    self._cond.notify_all()
+                if ao_aguardar is not None:
+                    ao_aguardar(0)
+            self._ativos += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._ativos -= 1
+                self._cond.notify_all()
+
+
+PORTAO = Portao()
+
+
+# ==== VOO ÚNICO ====
+@dataclass
+class _Voo:
+    pronto: threading.Event = field(default_factory=threading.Event)
+    partes: list = field(default_factory=list)
+    ouvintes: list = field(default_factory=list)
+    resultado: Optional[str] = None
+    erro: Optional[BaseException] = None
+
+
+_voos_lock = threading.Lock()
+_voos: dict = {}
+
+
+def voo_unico(chave, fn, ao_receber=None):
+    """`fn(repassar)` uma vez por chave em andamento; `repassar(trecho)` chega a todos os `ao_receber`.
+
+    Quem chega com a chamada já em curso recebe o texto parcial acumulado e
+    depois o mesmo resultado (ou a mesma exceção).
+    """
+    with _voos_lock:
+        voo = _voos.get(chave)
+        lider = voo is None
+        if lider:
+            voo = _voos[chave] = _Voo()
+        if ao_receber is not None:
+            for trecho in voo.partes:
+                ao_receber(trecho)
+            voo.ouvintes.append(ao_receber)
+
+    if not lider:
+        with metricas.span("flowise", "voo_unico"):
+            voo.pronto.wait()
+        if voo.erro is not None:
+            raise voo.erro
+        return voo.resultado
+
+    def repassar(trecho):
+        with _voos_lock:
+            voo.partes.append(trecho)
+            for ouvinte in voo.ouvintes:
+                ouvinte(trecho)
+
+    try:
+        voo.resultado = fn(repassar)
+        return voo.resultado
+    except BaseException as e:
+        voo.erro = e
+        raise
+    finally:
+        with _voos_lock:
+            _voos.pop(chave, None)
+        voo.pronto.set()
@@ -1,17 +1,25 @@
-import pandas as pd
 import streamlit as st
-import numpy as np
-import requests
-import psycopg2
 import os
+import time
 import unicodedata
 import datetime as dt
+import functools
 from typing import Optional, Tuple, Literal
-from psycopg2 import sql as psql
-from psycopg2.extras import RealDictCursor
-from sqlalchemy import create_engine
-from sqlalchemy import text as sa_text
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
+
+import cache_llm
+import contexto
+from contexto import (
+    INFO_TAGS_PF, INFO_TAGS_PD, INFO_OBJETIVOS, INFO_TAREFAS, INFO_DIAGNOSTICO,
+)
+import diretorio
+import flowise
+import formatador_pdi
+import graph
+import jobs
+import metricas
+import prompts
+import rascunhos
 
 def _get_cfg(name, required=False, default=None):
     # tenta env; se existir st.secrets localmente, tenta também
@@ -38,6 +46,14 @@ CLIENT_ID     = _get_cfg("CLIENT_ID",     required=False)
 CLIENT_SECRET = _get_cfg("CLIENT_SECRET", required=False)
 TENANT_ID     = _get_cfg("TENANT_ID",     required=False)
 SENDER_EMAIL  = _get_cfg("SENDER_EMAIL",  required=False)
+GRAPH_CFG = graph.ConfigGraph(TENANT_ID, CLIENT_ID, CLIENT_SECRET, SENDER_EMAIL)
+graph.iniciar_worker(DATABASE_URL, GRAPH_CFG)
+
+# e-mails (separados por vírgula) que veem o painel de debug do rerun
+ADMIN_EMAILS = {e.strip().lower() for e in (_get_cfg("ADMIN_EMAILS", default="")).split(",") if e.strip()}
+
+metricas.iniciar_rerun()
+metricas.iniciar_servidor()
 
 
 foco = 'pdi'
@@ -45,18 +61,11 @@ foco = 'pdi'
 # ==== TELA DE LOGIN ====
 def autenticar_usuario(email, senha):
     try:
-        with psycopg2.connect(DATABASE_URL) as conn, conn.cursor() as cur:
-            cur.execute("""
-                SELECT id
-                FROM pessoas_ativos
-                WHERE email = %s
-                LIMIT 1;
-            """, (email,))
-            row = cur.fetchone()
-            if row:
-                id_banco = str(row[0]).strip()
-                return id_banco == senha.strip()
-            return False
+        pessoa = diretorio.buscar(DATABASE_URL, email)
+        if pessoa:
+            id_banco = str(pessoa.id).strip()
+            return id_banco == senha.strip()
+        return False
     except Exception as e:
         st.error(f"[ERRO] Falha ao conectar no banco: {e}")
         return False
@@ -88,24 +97,6 @@ delta_tempo = 90       # dias
 tempo_atualizacao = 180  # dias
 
 
-# ==== TIPOS ====
-INFO_TAGS_PF   = "tags pontos fortes"
-INFO_TAGS_PD   = "tags pontos desenvolvimento"
-INFO_OBJETIVOS = "objetivos de carreira"
-INFO_TAREFAS   = "tarefas cargo (autoavaliação)"
-INFO_DIAGNOSTICO = "diagnostico pdi"
-
-TIPOS_CANON = [
-    INFO_TAGS_PF,
-    INFO_TAGS_PD,
-    "resumo avd",
-    "output_feedback",
-    "output_pdi",
-    INFO_OBJETIVOS,
-    INFO_TAREFAS,
-    INFO_DIAGNOSTICO,
-]
-
 # ==== HELPERS ====
 def _is_empty_text(x): return x is None or str(x).strip() == ""
 def _parse_data(dt_):
@@ -117,186 +108,118 @@ def _parse_data(dt_):
     return None
 def _dias_desde(d): return None if d is None else (date.today() - d).days
 
-# ==== BANCO ====
-def _descobrir_tabela(conn, alvo="dados_AVD_pessoas"):
-    with conn.cursor() as cur:
-        cur.execute("""
-            SELECT schemaname, tablename
-            FROM pg_catalog.pg_tables
-            WHERE lower(tablename) = lower(%s)
-            ORDER BY (schemaname = 'public') DESC, schemaname, tablename
-            LIMIT 1;
-        """, (alvo,))
-        row = cur.fetchone()
-        if row: return row[0], row[1]
-        raise RuntimeError("Tabela não encontrada")
+# ==== SEÇÕES (st.fragment) ====
+# Cada seção da página reroda sozinha quando o usuário interage com ela. Se a
+# interação liberar ou esconder outra seção (as "etapas"), a página inteira roda
+# de novo, levando junto os avisos que a seção mostrou.
+def _etapas():
+    campos_ok = all(
+        st.session_state.get(info) or ctx.info(info)[0]
+        for info in (INFO_TAGS_PF, INFO_TAGS_PD, INFO_OBJETIVOS, INFO_TAREFAS)
+    )
+    return (
+        foco == "pdi" and campos_ok,
+        bool(st.session_state.get("diagnostico_salvo")),
+        bool(st.session_state.get("Competencia_PDI_1")),
+    )
+
+def _avisar(msg):
+    st.success(msg)
+    st.session_state.setdefault("_avisos_secao", []).append(msg)
+
+def secao(fn):
+    @st.fragment
+    @functools.wraps(fn)
+    def _executar(*args, **kwargs):
+        st.session_state["_avisos_secao"] = []
+        fn(*args, **kwargs)
+        empurrar_rascunho()
+        if _etapas() != st.session_state.get("_etapas"):
+            st.session_state["_avisos"] = st.session_state["_avisos_secao"]
+            st.rerun()
+    return _executar
 
+# ==== BANCO ====
 def salvar_info(email: str, informacao: str, descricao: str):
-    if _is_empty_text(descricao):
+    salvar_infos(email, [(informacao, descricao)])
+
+def salvar_infos(email: str, pares):
+    """Salva vários (informacao, descricao) numa única transação; ignora os vazios."""
+    pares = [(i, d) for i, d in pares if not _is_empty_text(d)]
+    if not pares:
         return
+    nomes = ", ".join(i for i, _ in pares)
     try:
-        with psycopg2.connect(DATABASE_URL) as conn:
-            schema, table = _descobrir_tabela(conn)
-            tbl = psql.SQL("{}.{}").format(psql.Identifier(schema), psql.Identifier(table))
-            query = psql.SQL("""
-                INSERT INTO {tbl} (email, informacao, descricao, data)
-                VALUES (%s, %s, %s, %s);
-            """).format(tbl=tbl)
-            with conn.cursor() as cur:
-                cur.execute(query, (email, informacao, descricao.strip(), datetime.now()))
-            conn.commit()
-        st.success(f"[OK] {informacao} salvo.")
+        contexto.inserir_infos(DATABASE_URL, email, pares)
+        _avisar(f"[OK] {nomes} salvo." if len(pares) == 1 else f"[OK] {nomes} salvos.")
     except Exception as e:
-        st.error(f"[ERRO] Falha ao salvar {informacao}: {e}")
-
-def get_latest_infos(email: str):
-    valores = {t: "" for t in TIPOS_CANON}
-    datas   = {t: None for t in TIPOS_CANON}
+        st.error(f"[ERRO] Falha ao salvar {nomes}: {e}")
+
+# ==== CONTEXTO DO USUÁRIO ====
+# resumo_pessoa, cargo_pessoa, id_pessoa, historico_bot, resumos semanais e últimas infos
+# o snapshot é do processo: no início da sessão (que pode ter vindo de outra réplica) e a cada
+# CONTEXTO_VALIDAR s, confere se nada foi salvo depois dele
+validar_ctx = time.monotonic() >= st.session_state.get("_ctx_validar_em", 0.0)
+ctx = contexto.obter_contexto(email, DATABASE_URL, DATABASE_URL_RESUMO_SEMANAL,
+                              dias_bot=delta_tempo_resumo, dias_resumos=delta_tempo, validar=validar_ctx)
+if validar_ctx:
+    st.session_state["_ctx_validar_em"] = time.monotonic() + contexto.CONTEXTO_VALIDAR
+for erro in ctx.erros:
+    st.error(erro)
+resumo_pessoa, cargo_pessoa, id_pessoa = ctx.resumo_pessoa, ctx.cargo_pessoa, ctx.id_pessoa
+historico_bot = ctx.historico_bot
+sessionId = f"{id_pessoa}:{dt.date.today().isoformat()}"
+
+# ==== RASCUNHO (estado entre réplicas) ====
+# o que ainda não foi salvo em dados_AVD_pessoas vive no rascunho do ciclo (rascunhos.py),
+# para a sessão continuar em outra réplica ou depois de um deploy
+CAMPOS_RASCUNHO = ("diagnostico", "diagnostico_salvo", "Competencia_PDI_1", "Competencia_PDI_2", "pdi")
+ciclo = rascunhos.ciclo_atual()
+
+def puxar_rascunho():
+    """Traz para o session_state o que mudou no rascunho (na 1ª execução e a cada RASCUNHO_RECHECAR s)."""
+    estado = st.session_state.get("_rascunho")
+    if estado is not None and time.monotonic() < estado["proxima"]:
+        return
     try:
-        with psycopg2.connect(DATABASE_URL) as conn:
-            schema, table = _descobrir_tabela(conn)
-            tbl = psql.SQL("{}.{}").format(psql.Identifier(schema), psql.Identifier(table))
-            query = psql.SQL("""
-                SELECT DISTINCT ON (info_norm)
-                       info_norm, descricao, data
-                FROM (
-                    SELECT trim(lower(informacao)) AS info_norm,
-                           descricao, data
-                    FROM {tbl}
-                    WHERE email = %s
-                ) t
-                ORDER BY info_norm, data DESC NULLS LAST;
-            """).format(tbl=tbl)
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query, (email,))
-                rows = cur.fetchall()
-        tipos_alvo = {t.strip().lower(): t for t in TIPOS_CANON}
-        for r in rows:
-            info_norm = (r.get("info_norm") or "").strip().lower()
-            if info_norm in tipos_alvo:
-                canon = tipos_alvo[info_norm]
-                valores[canon] = r.get("descricao") or ""
-                datas[canon]   = r.get("data")
+        rascunho = rascunhos.carregar(DATABASE_URL, email, ciclo)
     except Exception as e:
-        st.error(f"[ERRO] Falha ao acessar banco: {e}")
-    return (
-        valores[INFO_TAGS_PF], datas[INFO_TAGS_PF],
-        valores[INFO_TAGS_PD], datas[INFO_TAGS_PD],
-        valores["resumo avd"], datas["resumo avd"],
-        valores["output_feedback"], datas["output_feedback"],
-        valores["output_pdi"], datas["output_pdi"],
-        valores[INFO_OBJETIVOS], datas[INFO_OBJETIVOS],
-        valores[INFO_TAREFAS], datas[INFO_TAREFAS],
-        valores[INFO_DIAGNOSTICO], datas[INFO_DIAGNOSTICO],
-    )
-
-def obter_token_graph():
-    """Autentica no Azure AD e retorna um token de acesso válido"""
-    url = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token"
-    data = {
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "scope": "https://graph.microsoft.com/.default",
-        "grant_type": "client_credentials"
-    }
-    resp = requests.post(url, data=data)
-    resp.raise_for_status()
-    return resp.json()["access_token"]
-
-def enviar_email_graph(destinatario: str, assunto: str, corpo: str):
-    """Envia um e-mail pelo Microsoft Graph"""
-    token = obter_token_graph()
-    url = f"https://graph.microsoft.com/v1.0/users/{SENDER_EMAIL}/sendMail"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-    message = {
-        "message": {
-            "subject": assunto,
-            "body": {
-                "contentType": "Text",
-                "content": corpo
-            },
-            "toRecipients": [
-                {"emailAddress": {"address": destinatario}}
-            ]
-        }
-    }
-    resp = requests.post(url, headers=headers, json=message)
-    if resp.status_code in (200, 202):
-        return True
-    else:
-        st.error(f"[ERRO] Falha ao enviar email: {resp.text}")
-        return False
+        st.warning(f"⚠️ Não foi possível carregar o rascunho: {e}")
+        return
+    base = estado["dados"] if estado is not None else {}
+    for campo in CAMPOS_RASCUNHO:
+        if campo in rascunho.dados and rascunho.dados[campo] != base.get(campo):
+            st.session_state[campo] = rascunho.dados[campo]
+    st.session_state["_rascunho"] = {"dados": dict(rascunho.dados), "versao": rascunho.versao,
+                                     "proxima": time.monotonic() + rascunhos.RASCUNHO_RECHECAR}
+
+def empurrar_rascunho():
+    """Grava no rascunho os campos que mudaram no session_state desde a última leitura/gravação."""
+    estado = st.session_state.get("_rascunho")
+    if estado is None:
+        return
+    alteracoes = {c: st.session_state[c] for c in CAMPOS_RASCUNHO
+                  if c in st.session_state and st.session_state[c] != estado["dados"].get(c)}
+    if not alteracoes:
+        return
+    try:
+        try:
+            versao = rascunhos.salvar(DATABASE_URL, email, ciclo, alteracoes, estado["versao"])
+        except rascunhos.ConflitoVersao:
+            # outra sessão (ou o job da geração) gravou no meio: estes campos prevalecem;
+            # os dela chegam no próximo puxar_rascunho
+            atual = rascunhos.carregar(DATABASE_URL, email, ciclo)
+            pendentes = {c: v for c, v in alteracoes.items() if atual.dados.get(c) != v}
+            versao = (rascunhos.salvar(DATABASE_URL, email, ciclo, pendentes, atual.versao)
+                      if pendentes else atual.versao)
+            estado["proxima"] = 0.0
+    except Exception as e:
+        st.warning(f"⚠️ Não foi possível guardar o rascunho: {e}")
+        return
+    estado["dados"].update(alteracoes)
+    estado["versao"] = versao
 
-# ==== CONSULTAS AUXILIARES ====
-# resumo_pessoa, cargo_pessoa, id_pessoa
-resumo_pessoa, cargo_pessoa, id_pessoa = None, None, None
-try:
-    conn = psycopg2.connect(DATABASE_URL)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT resumo_pessoa, id, posicao
-        FROM pessoas_ativos
-        WHERE email = %s
-        LIMIT 1;
-    """, (email,))
-    result = cur.fetchone()
-    if result:
-        resumo_pessoa, id_pessoa, cargo_pessoa = result
-    cur.close()
-    conn.close()
-except Exception as e:
-    st.error(f"[ERRO] Falha ao buscar resumo_pessoa: {e}")
-
-# histórico bot
-historico_bot = ""
-try:
-    data_limite = date.today() - timedelta(days=delta_tempo_resumo)
-    with psycopg2.connect(DATABASE_URL) as conn, conn.cursor() as cur:
-        cur.execute("""
-            SELECT data, output_pessoa_bot
-            FROM outputs_bot_pessoas
-            WHERE email = %s
-              AND data >= %s
-            ORDER BY data DESC
-            LIMIT 5;
-        """, (email, data_limite))
-        rows = cur.fetchall() or []
-        if rows:
-            historico_bot = '; '.join(
-                f"data: {d.strftime('%Y-%m-%d')} - resumo: {resumo or ''}" for d, resumo in rows
-            )
-        else:
-            historico_bot = "Não há nenhuma interação até o momento"
-except Exception as e:
-    st.error(f"[ERRO] Falha ao buscar historico_bot: {e}")
-
-# resumos semanais
-resumos_semanal = ""
-try:
-    engine = create_engine(DATABASE_URL_RESUMO_SEMANAL)
-    data_limite = datetime.now() - timedelta(days=delta_tempo)
-    sql = sa_text("""
-        SELECT summary, "timestamp"
-        FROM resumos
-        WHERE employee_email = :email
-          AND "timestamp" >= :data_limite
-        ORDER BY "timestamp" ASC
-    """)
-    with engine.connect() as conn:
-        df = pd.read_sql_query(sql, conn, params={"email": email, "data_limite": data_limite})
-    if not df.empty:
-        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-        linhas = [
-            f"resumo da semana {ts.strftime('%d/%m/%Y')} - {sm}"
-            for ts, sm in zip(df["timestamp"], df["summary"].fillna("").astype(str).str.strip())
-            if pd.notnull(ts)
-        ]
-        resumos_semanal = "\n".join(linhas)
-except Exception as e:
-    st.error(f"[ERRO] Falha ao buscar resumos_semanal: {e}")
+puxar_rascunho()
 
 # ==== FORM ====
 def pergunta_streamlit(rotulo, valor_atual, data_atual, informacao):
@@ -318,105 +241,105 @@ def pergunta_streamlit(rotulo, valor_atual, data_atual, informacao):
     else:
         st.session_state[informacao] = valor_atual
 
+# ==== GERAÇÕES EM SEGUNDO PLANO ====
+@st.fragment(run_every=1)
+def _andamento_geracao(chave, rotulo):
+    job = jobs.obter(chave)
+    if job is not None and job.em_andamento:
+        if job.posicao_fila:
+            st.info(f"⏳ Aguardando na fila para gerar {rotulo}: posição {job.posicao_fila}. {job.decorrido:.0f}s")
+        else:
+            st.info(f"⏳ Gerando {rotulo}... {job.decorrido:.0f}s")
+        if job.parcial:
+            st.markdown(job.parcial)
+    else:
+        st.rerun()
+
+def acompanhar_geracao(tipo, destino, rotulo):
+    """Liga o job de geração (tipo + sessionId) ao st.session_state[destino].
+
+    Enquanto o job roda, mostra o andamento e se atualiza sozinho; quando termina,
+    o resultado vai para o session_state uma única vez por job.
+    """
+    job = jobs.obter(jobs.chave_job(tipo, sessionId))
+    if job is None:
+        return
+    if job.em_andamento:
+        _andamento_geracao(job.chave, rotulo)
+        return
+    visto = f"_job_visto_{destino}"
+    if st.session_state.get(visto) == job.id:
+        return
+    st.session_state[visto] = job.id
+    if job.status == jobs.ERRO:
+        st.error(f"[ERRO] Falha ao gerar {rotulo}: {job.erro}")
+    elif not (job.resultado or "").strip():
+        st.warning("⚠️ A API não retornou conteúdo.")
+    else:
+        st.session_state[destino] = job.resultado
+
 # ==== EXECUÇÃO STREAMLIT ====
 st.title("PDI - Mindsight")
 st.subheader(f"Pessoa: {email}")
-
-(
-    pontos_fortes, data_pontos_fortes,
-    pontos_desenvolvimento, data_pontos_desenvolvimento,
-    resumo_avd, data_resumo_avd,
-    feedback, data_feedback,
-    pdi, data_pdi,
-    objetivos, data_objetivos,
-    tarefas, data_tarefas,
-    diagnostico, data_diag
-) = get_latest_infos(email)
+for aviso in st.session_state.pop("_avisos", []):
+    st.success(aviso)
+st.session_state["_etapas"] = _etapas()
 
 # Perguntas dinâmicas
-pergunta_streamlit("Aponte resumidamente seus principais pontos fortes:",
-                   pontos_fortes, data_pontos_fortes, INFO_TAGS_PF)
-
-pergunta_streamlit("Resumidamente, em quais pontos você precisa se desenvolver?",
-                   pontos_desenvolvimento, data_pontos_desenvolvimento, INFO_TAGS_PD)
-
-pergunta_streamlit("Resuma seus principais objetivos de carreira (6–12 meses):",
-                   objetivos, data_objetivos, INFO_OBJETIVOS)
-
-st.subheader("Tarefas do cargo")
-if cargo_pessoa:
-    st.write(f"Cargo: {cargo_pessoa}")
-tarefas_cargo = st.session_state.get("tarefas_cargo", "")
-resposta_tarefas = st.text_area(
-    "Descreva suas tarefas mais importantes, destacando as que tem mais facilidade e as que tem mais dificuldade:",
-    value=tarefas or "", key="tarefas_area"
-)
-if st.button("Salvar tarefas"):
-    st.session_state[INFO_TAREFAS] = resposta_tarefas
-    salvar_info(email, INFO_TAREFAS, resposta_tarefas)
-resultado = resposta_tarefas
+@secao
+def secao_perguntas():
+    pergunta_streamlit("Aponte resumidamente seus principais pontos fortes:",
+                       *ctx.info(INFO_TAGS_PF), INFO_TAGS_PF)
+
+    pergunta_streamlit("Resumidamente, em quais pontos você precisa se desenvolver?",
+                       *ctx.info(INFO_TAGS_PD), INFO_TAGS_PD)
+
+    pergunta_streamlit("Resuma seus principais objetivos de carreira (6–12 meses):",
+                       *ctx.info(INFO_OBJETIVOS), INFO_OBJETIVOS)
+
+@secao
+def secao_tarefas():
+    st.subheader("Tarefas do cargo")
+    if cargo_pessoa:
+        st.write(f"Cargo: {cargo_pessoa}")
+    tarefas, _ = ctx.info(INFO_TAREFAS)
+    resposta_tarefas = st.text_area(
+        "Descreva suas tarefas mais importantes, destacando as que tem mais facilidade e as que tem mais dificuldade:",
+        value=tarefas or "", key="tarefas_area"
+    )
+    if st.button("Salvar tarefas"):
+        st.session_state[INFO_TAREFAS] = resposta_tarefas
+        salvar_info(email, INFO_TAREFAS, resposta_tarefas)
+
+def _tarefas_atuais():
+    # o que está no campo de tarefas, mesmo sem salvar (como era antes das seções)
+    return st.session_state.get("tarefas_area", ctx.info(INFO_TAREFAS)[0])
 
 # ==== DIAGNÓSTICO ====
-campos_ok = all([
-    st.session_state.get(INFO_TAGS_PF) or pontos_fortes,
-    st.session_state.get(INFO_TAGS_PD) or pontos_desenvolvimento,
-    st.session_state.get(INFO_OBJETIVOS) or objetivos,
-    st.session_state.get(INFO_TAREFAS) or tarefas
-])
-
-if foco == "pdi" and campos_ok:
+@secao
+def secao_diagnostico():
     st.subheader("Diagnóstico do PDI")
 
+    regenerar_diag = st.checkbox("Gerar de novo, ignorando diagnóstico já gerado para as mesmas informações",
+                                 key="regenerar_diagnostico")
     if st.button("Gerar Diagnóstico com IA"):
-        pergunta_prompt = f"""
-        Nesse momento, você como especialista deverá fazer um diagnóstico que ajude a pessoa a tomar a decisão do que pode fazer mais sentido se desenvolver.
-        para isso, aqui estão algumas informações da pessoa {resumo_pessoa}.
-        O feedback, caso a pessoa tenha, foi esse aqui {feedback}.
-        os pontos fortes são: {pontos_fortes} e os pontos de desenvolvimento são: {pontos_desenvolvimento}.
-        Na tarefa atual essa são as tarefas e um pouco de como ela é: {resultado}.
-        e os objetivos são: {objetivos} e que tem o seguinte histórico de interação com você: {historico_bot}.
-        Leve em consideração também, para mapear as tarefas e dificuldades os relatórios semanais da pessoa {resumos_semanal}.
-        Retorne esse diagnóstico com a seguinte estrutura e oferecendo argumentos e os motivos.
-        1- Resumo da pessoa até o momento:
-        2- Gaps na posição atual e direcional para a posição atual: 
-        3- Futuro dado posição atual e objetivos de carreira:
-        4- Indicações de pontos de desenvolvimento:(Citando competências, habilidades e atitudes que dado as informações a pessoa deveria considerar desenvolver, bem como os motivos. Foque apenas em sugestões sem montar um PDI ou usar o 70 20 10. é apenas recomendação.)
-        """
-        sessionId = f"{id_pessoa}:{dt.date.today().isoformat()}"
-
-        try:
-            headers = {"Content-Type": "application/json"}
-            # Se tiver uma API Key no Flowise, descomente a linha abaixo
-            # headers["Authorization"] = f"Bearer {FLOWISE_API_KEY}"
-
-            r = requests.post(
-                API_URL,
-                json={"question": pergunta_prompt, "overrideConfig": {"sessionId": sessionId}},
-                headers=headers,
-                timeout=150
-            )
-            r.raise_for_status()
-            output = r.json()
-
-            resposta = (
-                output.get("text")
-                or output.get("answer")
-                or output.get("output")
-                or (output["data"][0]["text"] if "data" in output and output["data"] else "")
-                or ""
-            )
-
-            if not resposta.strip():
-                st.warning("⚠️ A API não retornou conteúdo.")
-            else:
-                st.session_state["diagnostico"] = resposta
-
-        except Exception as e:
-            st.error(f"[ERRO] Falha ao gerar diagnóstico: {e}")
-            if "r" in locals():
-                st.text(r.text)
-
-
+        pergunta_prompt = prompts.prompt_diagnostico(
+            resumo_pessoa=resumo_pessoa, feedback=ctx.info("output_feedback")[0],
+            pontos_fortes=ctx.info(INFO_TAGS_PF)[0], pontos_desenvolvimento=ctx.info(INFO_TAGS_PD)[0],
+            tarefas=_tarefas_atuais(), objetivos=ctx.info(INFO_OBJETIVOS)[0], historico_bot=historico_bot,
+            resumos=ctx.resumos,
+        )
+        st.caption(f"Prompt do diagnóstico: ~{pergunta_prompt.tokens} tokens")
+        jobs.submeter(jobs.chave_job("diagnostico", sessionId),
+                      rascunhos.gerar_no_rascunho, DATABASE_URL, email, ciclo, "diagnostico",
+                      cache_llm.gerar_com_cache, DATABASE_URL, flowise.gerar_stream, API_URL,
+                      pergunta_prompt.texto, sessionId, regenerar=regenerar_diag, parcial=True)
+
+    acompanhar_geracao("diagnostico", "diagnostico", "diagnóstico")
+    # diagnóstico já salvo (inclusive o pré-gerado em lote) é o ponto de partida
+    diagnostico, _ = ctx.info(INFO_DIAGNOSTICO)
+    if "diagnostico" not in st.session_state and not _is_empty_text(diagnostico):
+        st.session_state["diagnostico"] = diagnostico
 
     if "diagnostico" in st.session_state:
         diag_edit = st.text_area("Edite seu diagnóstico:", value=st.session_state["diagnostico"], height=300)
@@ -425,77 +348,45 @@ if foco == "pdi" and campos_ok:
             st.session_state["diagnostico_salvo"] = diag_edit
 
 # ==== COMPETÊNCIAS ====
-if st.session_state.get("diagnostico_salvo"):
+@secao
+def secao_competencias():
     st.subheader("Definição de Competências para o PDI")
 
     comp1 = st.text_input("Competência 1 (obrigatória)", key="Competencia_PDI_1")
     comp2 = st.text_input("Competência 2 (opcional)", key="Competencia_PDI_2")
 
     if st.button("Salvar Competências"):
-        if comp1.strip():
-            salvar_info(email, "Competencia_PDI_1", comp1.strip())
-        if comp2.strip():
-            salvar_info(email, "Competencia_PDI_2", comp2.strip())
-        st.success("Competências salvas com sucesso!")
+        salvar_infos(email, [("Competencia_PDI_1", comp1), ("Competencia_PDI_2", comp2)])
 
 # ==== GERAR PDI ====
-if st.session_state.get("Competencia_PDI_1"):
+@secao
+def secao_pdi():
     st.subheader("Plano de Desenvolvimento Individual (PDI)")
 
     focos_desenvolvimento = [st.session_state["Competencia_PDI_1"]]
     if st.session_state.get("Competencia_PDI_2"):
         focos_desenvolvimento.append(st.session_state["Competencia_PDI_2"])
 
+    regenerar_pdi = st.checkbox("Gerar de novo, ignorando PDI já gerado para as mesmas informações",
+                                key="regenerar_pdi")
     if st.button("Gerar PDI com IA"):
-        prompt_pdi = f"""
-        Você é um especialista em desenvolvimento de carreira e deverá criar um Plano de Desenvolvimento Individual (PDI) de alta qualidade.
-
-        Use as informações do diagnóstico inicial abaixo como base para montar o PDI:
-
-        {st.session_state['diagnostico_salvo']}
-
-        Além disso, utilize as informações reais de {resultado} e {resumos_semanal} para sugerir atividades práticas que façam sentido no contexto do dia a dia da pessoa.
-
-        Estruture o PDI no modelo 70-20-10, separado por competência para os seguintes pontos de desenvolvimento escolhidos pela pessoa {focos_desenvolvimento}.
-        Para cada competência identificada no diagnóstico, siga esta estrutura:
-
-        ### Competência: [nome da competência]
-
-        **Objetivo de Desenvolvimento**
-        Descreva o objetivo principal para esta competência, resumido em 2-3 linhas.
-
-        **70% Atividades práticas (on the job)**
-        Liste de 3 a 5 atividades diretamente conectadas às {resultado} e {resumos_semanal} da pessoa.
-        Cada atividade deve ser descrita no formato SMART.
-
-        **20% Aprendizagem com os outros**
-        Liste de 2 a 4 atividades informais (mentorias, feedbacks, shadowing etc.), conectadas às {resultado} e {resumos_semanal}, no formato SMART.
-
-        **10% Cursos e treinamentos**
-        Indique de 1 a 3 formações formais relacionadas à competência.
+        prompt_pdi = prompts.prompt_pdi(
+            diagnostico=st.session_state['diagnostico_salvo'], tarefas=_tarefas_atuais(),
+            resumos=ctx.resumos, focos=focos_desenvolvimento,
+        )
+        st.caption(f"Prompt do PDI: ~{prompt_pdi.tokens} tokens")
+        jobs.submeter(jobs.chave_job("pdi", sessionId),
+                      rascunhos.gerar_no_rascunho, DATABASE_URL, email, ciclo, "pdi",
+                      cache_llm.gerar_com_cache, DATABASE_URL, flowise.gerar_stream, API_URL,
+                      prompt_pdi.texto, sessionId, regenerar=regenerar_pdi, parcial=True)
 
-        --- Regras ---
-        - O PDI deve ter múltiplas competências, cada uma com sua própria estrutura.
-        - Nas seções 70% e 20%, use {resultado} e {resumos_semanal} para alinhar à realidade.
-        - Todas as metas devem estar no formato SMART.
-        - Conecte os objetivos de desenvolvimento ao impacto esperado no negócio.
-        """
-        sessionId = f"{id_pessoa}:{dt.date.today().isoformat()}"
-        r = requests.post(API_URL, json={
-            "question": prompt_pdi,
-            "overrideConfig": {"sessionId": sessionId}
-        })
-        output = r.json()
-        resposta = output.get("text", "")
-        st.session_state["pdi"] = resposta
+    acompanhar_geracao("pdi", "pdi", "PDI")
 
     if "pdi" in st.session_state:
         pdi_edit = st.text_area("Edite seu PDI:", value=st.session_state["pdi"], height=400)
         if st.button("Salvar PDI Final"):
-            # 1. Salva o PDI final no banco
-            salvar_info(email, "output_pdi", pdi_edit)
-
-            # 2. Envia para OpenAI no formato solicitado
+            # 1. Monta a versão formatada a partir da estrutura do próprio PDI;
+            #    só pede ao LLM se o texto editado fugiu do formato
             prompt_formatado = f"""
             A partir do PDI a seguir, retorne no seguinte formato, mantendo sempre ele:
 
@@ -519,19 +410,24 @@ if st.session_state.get("Competencia_PDI_1"):
             """
 
             try:
-                # 3. Chama sua API (mesma estrutura que você já usa para gerar PDI normal)
-                sessionId = f"{id_pessoa}:{dt.date.today().isoformat()}"
-                r = requests.post(API_URL, json={
-                    "question": prompt_formatado,
-                    "overrideConfig": {"sessionId": sessionId}
-                })
-                output = r.json()
-                pdi_formatado = output.get("text", "").strip()
-
-                # 4. Salva no banco
-                salvar_info(email, "output_pdi_formatado", pdi_formatado)
-
-                # 5. Envia e-mail para o usuário
+                try:
+                    pdi_formatado = formatador_pdi.formatar(formatador_pdi.extrair_objetivos(pdi_edit))
+                except formatador_pdi.PDIForaDoFormato:
+                    # 2. Chama sua API (mesma estrutura que você já usa para gerar PDI normal)
+                    pdi_formatado = cache_llm.gerar_com_cache(
+                        DATABASE_URL, flowise.gerar, API_URL, prompt_formatado, sessionId
+                    ).strip()
+            except Exception as e:
+                st.error(f"[ERRO] Falha ao gerar PDI formatado: {e}")
+                # o PDI final é salvo mesmo sem a versão formatada
+                salvar_info(email, "output_pdi", pdi_edit)
+                pdi_formatado = None
+
+            if pdi_formatado is not None:
+                # 3. Salva o PDI final e o formatado juntos no banco
+                salvar_infos(email, [("output_pdi", pdi_edit), ("output_pdi_formatado", pdi_formatado)])
+
+                # 4. Envia e-mail para o usuário
                 assunto = "Seu PDI - Mindsight"
                 corpo = f"""
                 Olá,
@@ -546,12 +442,43 @@ if st.session_state.get("Competencia_PDI_1"):
                 Atenciosamente,
                 Equipe Mindsight
                 """
-                if enviar_email_graph(email, assunto, corpo):
-                    st.success(f"📧 PDI enviado com sucesso para {email}")
-
-                # 6. Mostra na tela também
+                try:
+                    if not GRAPH_CFG.completa:
+                        st.error("[ERRO] Falha ao enviar email: envio pelo Microsoft Graph não configurado.")
+                    else:
+                        graph.enfileirar_email(DATABASE_URL, email, assunto, corpo)
+                        st.success(f"📧 PDI na fila de envio para {email}")
+                except Exception as e:
+                    st.error(f"[ERRO] Falha ao enviar email: {e}")
+
+                # 5. Mostra na tela também
                 st.success("PDI Final e versão formatada salvos com sucesso! -- VÁ PARA O LINK https://acompanhamento.mindsight.com.br/mindsight/pdi/rodadas E SALVE SEU PDI NO SISTEMA USANDO AS INFOS ABAIXO")
                 st.text_area("PDI Formatado:", value=pdi_formatado, height=300)
 
-            except Exception as e:
-                st.error(f"[ERRO] Falha ao gerar PDI formatado: {e}")
\ No newline at end of file
+diagnostico_liberado, competencias_liberadas, pdi_liberado = st.session_state["_etapas"]
+secao_perguntas()
+secao_tarefas()
+if diagnostico_liberado:
+    secao_diagnostico()
+if competencias_liberadas:
+    secao_competencias()
+if pdi_liberado:
+    secao_pdi()
+
+# ==== DEBUG (admins) ====
+def painel_debug():
+    inicio = metricas.inicio_rerun()
+    with st.expander("🔧 Debug: linha do tempo deste rerun"):
+        linhas = []
+        for s in metricas.linha_do_tempo():
+            medidas = " ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in s.medidas.items())
+            linhas.append(f"{(s.inicio - inicio) * 1000:9.1f} ms {s.duracao * 1000:9.1f} ms  "
+                          f"{s.tipo:<8} {s.nome:<32} {s.status:<5} {medidas} {s.erro or ''}".rstrip())
+        st.code("\n".join(linhas) or "(nenhuma operação neste rerun)", language=None)
+        if st.checkbox("Mostrar métricas do processo (formato Prometheus)", key="_debug_metricas"):
+            st.code(metricas.exportar_prometheus(), language=None)
+
+empurrar_rascunho()
+metricas.fechar_rerun()
+if email.strip().lower() in ADMIN_EMAILS:
+    painel_debug()
@@ -0,0 +1,154 @@
+"""Pré-geração em lote dos diagnósticos de PDI, fora do Streamlit.
+
+Percorre `pessoas_ativos` (ou uma lista de e-mails), monta o mesmo prompt do app
+com o contexto de cada pessoa, gera com concorrência limitada e grava o
+resultado em dados_AVD_pessoas como "diagnostico pdi". O progresso vai para um
+arquivo de checkpoint, e uma execução interrompida continua de onde parou.
+
+Uso:
+    python batch_diagnosticos.py --concorrencia 4 --checkpoint diagnosticos.jsonl
+    python batch_diagnosticos.py --emails emails.txt --regenerar
+"""
+import argparse
+import datetime as dt
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+
+import admissao
+import cache_llm
+import contexto
+import db
+import flowise
+import prompts
+from contexto import INFO_DIAGNOSTICO, INFO_OBJETIVOS, INFO_TAGS_PD, INFO_TAGS_PF, INFO_TAREFAS
+
+log = logging.getLogger("batch_diagnosticos")
+
+# mesmos parâmetros do app.py
+DELTA_TEMPO_RESUMO = 30   # dias
+DELTA_TEMPO = 90          # dias
+TEMPO_ATUALIZACAO = 180   # dias
+
+# status que não precisam ser refeitos ao retomar
+STATUS_FINAIS = {"ok", "incompleto", "existente"}
+
+
+def _cfg(nome, obrigatoria=False):
+    valor = (os.getenv(nome) or "").strip()
+    if not valor and obrigatoria:
+        sys.exit(f"Variável '{nome}' não está definida.")
+    return valor or None
+
+
+def listar_emails(dsn: str):
+    with db.conexao(dsn) as conn, conn.cursor() as cur:
+        cur.execute("SELECT email FROM pessoas_ativos WHERE email IS NOT NULL ORDER BY email;")
+        return [r[0] for r in cur.fetchall()]
+
+
+def ler_checkpoint(caminho: str) -> dict:
+    feitos = {}
+    if caminho and os.path.exists(caminho):
+        with open(caminho, encoding="utf-8") as f:
+            for linha in f:
+                if linha.strip():
+                    registro = json.loads(linha)
+                    feitos[registro["email"]] = registro["status"]
+    return feitos
+
+
+def gerar_diagnostico(email: str, cfg: dict, regenerar: bool) -> str:
+    """Gera e salva o diagnóstico de uma pessoa; devolve o status."""
+    ctx = contexto.carregar_contexto(email, cfg["dsn"], cfg["dsn_resumos"],
+                                     dias_bot=DELTA_TEMPO_RESUMO, dias_resumos=DELTA_TEMPO)
+    if not ctx.banco_ok:
+        raise RuntimeError("; ".join(ctx.erros))
+
+    diag_atual, data_diag = ctx.info(INFO_DIAGNOSTICO)
+    if diag_atual.strip() and not regenerar and data_diag is not None \
+            and (date.today() - data_diag.date()).days <= TEMPO_ATUALIZACAO:
+        return "existente"
+
+    valores = {t: ctx.info(t)[0] for t in (INFO_TAGS_PF, INFO_TAGS_PD, INFO_OBJETIVOS, INFO_TAREFAS)}
+    if not all(v.strip() for v in valores.values()):
+        # o app também só gera com os quatro campos preenchidos
+        return "incompleto"
+
+    prompt = prompts.prompt_diagnostico(
+        resumo_pessoa=ctx.resumo_pessoa, feedback=ctx.info("output_feedback")[0],
+        pontos_fortes=valores[INFO_TAGS_PF], pontos_desenvolvimento=valores[INFO_TAGS_PD],
+        tarefas=valores[INFO_TAREFAS], objetivos=valores[INFO_OBJETIVOS],
+        historico_bot=ctx.historico_bot, resumos=ctx.resumos,
+    )
+    session_id = f"{ctx.id_pessoa}:{dt.date.today().isoformat()}"
+    resposta = cache_llm.gerar_com_cache(cfg["dsn"], flowise.gerar, cfg["api_url"], prompt.texto,
+                                         session_id, regenerar=regenerar)
+    if not resposta.strip():
+        raise RuntimeError("A API não retornou conteúdo.")
+    contexto.inserir_info(cfg["dsn"], email, INFO_DIAGNOSTICO, resposta)
+    return "ok"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pré-gera diagnósticos de PDI para pessoas_ativos.")
+    parser.add_argument("--emails", help="arquivo com um e-mail por linha (padrão: todos de pessoas_ativos)")
+    parser.add_argument("--concorrencia", type=int, default=4, help="gerações simultâneas (padrão: 4)")
+    parser.add_argument("--checkpoint", default="diagnosticos_checkpoint.jsonl",
+                        help="arquivo de progresso para retomar (padrão: %(default)s)")
+    parser.add_argument("--limite", type=int, help="processa no máximo N pessoas")
+    parser.add_argument("--regenerar", action="store_true",
+                        help="gera mesmo para quem já tem diagnóstico recente e ignora o cache")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    cfg = {
+        "dsn": _cfg("DATABASE_URL", obrigatoria=True),
+        "dsn_resumos": _cfg("DATABASE_URL_RESUMO_SEMANAL"),
+        "api_url": _cfg("API_URL", obrigatoria=True),
+    }
+
+    if args.emails:
+        with open(args.emails, encoding="utf-8") as f:
+            emails = [l.strip() for l in f if l.strip()]
+    else:
+        emails = listar_emails(cfg["dsn"])
+    feitos = ler_checkpoint(args.checkpoint)
+    pendentes = [e for e in emails if feitos.get(e) not in STATUS_FINAIS]
+    if args.limite:
+        pendentes = pendentes[:args.limite]
+    ja_feitos = sum(1 for e in emails if feitos.get(e) in STATUS_FINAIS)
+    log.info("%s pessoas, %s já processadas, %s nesta execução", len(emails), ja_feitos, len(pendentes))
+
+    # processo próprio: o portão do flowise passa a seguir --concorrencia, e não
+    # GERACAO_CONCORRENCIA do app (a fila nunca passa do número de threads)
+    concorrencia = max(args.concorrencia, 1)
+    admissao.PORTAO = admissao.Portao(limite=concorrencia, fila_max=concorrencia)
+    log.info("concorrência: %s gerações simultâneas", concorrencia)
+
+    contagem: dict = {}
+    with open(args.checkpoint, "a", encoding="utf-8") as ckpt, \
+            ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        futuros = {executor.submit(gerar_diagnostico, e, cfg, args.regenerar): e for e in pendentes}
+        for futuro in as_completed(futuros):
+            email = futuros[futuro]
+            try:
+                status, erro = futuro.result(), None
+            except Exception as e:
+                status, erro = "erro", str(e)
+                log.warning("%s: %s", email, e)
+            contagem[status] = contagem.get(status, 0) + 1
+            ckpt.write(json.dumps({"email": email, "status": status, "erro": erro,
+                                   "em": dt.datetime.now().isoformat()}, ensure_ascii=False) + "\n")
+            ckpt.flush()
+            log.info("%s: %s", email, status)
+
+    log.info("Resumo: %s", contagem)
+    return 1 if contagem.get("erro") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
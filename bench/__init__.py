@@ -0,0 +1 @@
+"""Benchmark de carga/latência do app (ver bench/reruns.py)."""
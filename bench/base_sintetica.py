@@ -0,0 +1,147 @@
+"""Postgres do benchmark: sobe um local (opcional) e semeia dados sintéticos.
+
+As tabelas são criadas só se não existirem e as pessoas sintéticas usam o
+domínio @bench.local; ressemear apaga apenas essas linhas.
+
+Sem BENCH_DATABASE_URL, um Postgres descartável é iniciado com o pacote
+`pgserver` (pip install pgserver), com os dados em bench/.pgdata.
+"""
+import datetime as dt
+import os
+import random
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+DOMINIO = "bench.local"
+PASTA_DADOS = Path(__file__).resolve().parent / ".pgdata"
+
+SQL_CRIAR = """
+    CREATE TABLE IF NOT EXISTS pessoas_ativos (
+        id            text,
+        email         text,
+        resumo_pessoa text,
+        posicao       text
+    );
+    CREATE INDEX IF NOT EXISTS pessoas_ativos_email_idx ON pessoas_ativos (email);
+    CREATE TABLE IF NOT EXISTS "dados_AVD_pessoas" (
+        email      text,
+        informacao text,
+        descricao  text,
+        data       timestamp
+    );
+    CREATE TABLE IF NOT EXISTS outputs_bot_pessoas (
+        email             text,
+        data              timestamp,
+        output_pessoa_bot text
+    );
+    CREATE INDEX IF NOT EXISTS outputs_bot_pessoas_email_idx ON outputs_bot_pessoas (email, data);
+    CREATE TABLE IF NOT EXISTS resumos (
+        employee_email text,
+        summary        text,
+        "timestamp"    timestamp
+    );
+    CREATE INDEX IF NOT EXISTS resumos_email_idx ON resumos (employee_email, "timestamp");
+"""
+
+CARGOS = ["Analista de Dados", "Desenvolvedora Backend", "Product Manager", "Designer", "Analista de RH"]
+FRASES = [
+    "Conduziu a reunião semanal com o time e alinhou as prioridades da sprint.",
+    "Teve dificuldade em estimar prazos das entregas maiores.",
+    "Apoiou colegas na revisão de código e documentação.",
+    "Apresentou os resultados do trimestre para a liderança.",
+    "Organizou o backlog e negociou escopo com as áreas parceiras.",
+    "Relatou sobrecarga com demandas não planejadas.",
+]
+INFOS = {
+    "tags pontos fortes": "comunicação, organização, colaboração",
+    "tags pontos desenvolvimento": "priorização, negociação",
+    "objetivos de carreira": "assumir a liderança técnica do time nos próximos 12 meses",
+    "tarefas cargo (autoavaliação)": "planejamento da sprint (facilidade); estimativas (dificuldade)",
+    "output_feedback": "entrega com qualidade, precisa se posicionar mais nas reuniões",
+}
+
+
+def email_pessoa(n: int) -> str:
+    return f"pessoa{n:05d}@{DOMINIO}"
+
+
+def id_pessoa(n: int) -> str:
+    return f"id-{n:05d}"
+
+
+def iniciar_local() -> str:
+    """Sobe (ou reaproveita) o Postgres local do pgserver e devolve o DSN."""
+    try:
+        import pgserver
+    except ImportError:
+        raise SystemExit("Defina BENCH_DATABASE_URL ou instale o pgserver (pip install pgserver).")
+    servidor = pgserver.get_server(PASTA_DADOS, cleanup_mode=None)
+    return servidor.get_uri()
+
+
+def dsn_benchmark() -> str:
+    return (os.getenv("BENCH_DATABASE_URL") or "").strip() or iniciar_local()
+
+
+def _texto(rng: random.Random, frases: int) -> str:
+    return " ".join(rng.choice(FRASES) for _ in range(frases))
+
+
+def semear(dsn: str, pessoas: int = 200, versoes: int = 3, semanas: int = 12, semente: int = 42):
+    """Cria as tabelas e (re)gera `pessoas` pessoas sintéticas com histórico.
+
+    Cada pessoa tem `versoes` versões de cada informação, algumas interações com
+    o bot e `semanas` resumos semanais.
+    """
+    rng = random.Random(semente)
+    agora = dt.datetime.now().replace(microsecond=0)
+    filtro = f"%@{DOMINIO}"
+
+    pessoas_rows, avd_rows, bot_rows, resumo_rows = [], [], [], []
+    for n in range(pessoas):
+        email = email_pessoa(n)
+        pessoas_rows.append((id_pessoa(n), email, _texto(rng, 3), rng.choice(CARGOS)))
+        for v in range(versoes):
+            data = agora - dt.timedelta(days=30 * (versoes - v), minutes=rng.randint(0, 600))
+            for informacao, descricao in INFOS.items():
+                avd_rows.append((email, informacao, f"{descricao} (v{v + 1})", data))
+        for d in range(rng.randint(0, 6)):
+            bot_rows.append((email, agora - dt.timedelta(days=rng.randint(0, 40)), _texto(rng, 2)))
+        for s in range(semanas):
+            resumo_rows.append((email, _texto(rng, 4), agora - dt.timedelta(weeks=s, hours=rng.randint(0, 48))))
+
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(SQL_CRIAR)
+            cur.execute("DELETE FROM pessoas_ativos WHERE email LIKE %s", (filtro,))
+            cur.execute('DELETE FROM "dados_AVD_pessoas" WHERE email LIKE %s', (filtro,))
+            cur.execute("DELETE FROM outputs_bot_pessoas WHERE email LIKE %s", (filtro,))
+            cur.execute("DELETE FROM resumos WHERE employee_email LIKE %s", (filtro,))
+            execute_values(cur, "INSERT INTO pessoas_ativos (id, email, resumo_pessoa, posicao) VALUES %s",
+                           pessoas_rows, page_size=1000)
+            execute_values(cur, 'INSERT INTO "dados_AVD_pessoas" (email, informacao, descricao, data) VALUES %s',
+                           avd_rows, page_size=1000)
+            execute_values(cur, "INSERT INTO outputs_bot_pessoas (email, data, output_pessoa_bot) VALUES %s",
+                           bot_rows, page_size=1000)
+            execute_values(cur, 'INSERT INTO resumos (employee_email, summary, "timestamp") VALUES %s',
+                           resumo_rows, page_size=1000)
+            cur.execute("SELECT to_regclass('dados_avd_ultimos') IS NOT NULL")
+            if cur.fetchone()[0]:
+                # projeção já migrada: refaz as linhas das pessoas sintéticas
+                cur.execute("DELETE FROM dados_avd_ultimos WHERE email LIKE %s", (filtro,))
+                cur.execute("""
+                    INSERT INTO dados_avd_ultimos (email, info_norm, informacao, descricao, data)
+                    SELECT DISTINCT ON (email, trim(lower(informacao)))
+                           email, trim(lower(informacao)), informacao, descricao, data
+                    FROM "dados_AVD_pessoas"
+                    WHERE email LIKE %s
+                    ORDER BY email, trim(lower(informacao)), data DESC NULLS LAST
+                """, (filtro,))
+            cur.execute("ANALYZE")
+    finally:
+        conn.close()
+    return {"pessoas": len(pessoas_rows), "dados_AVD_pessoas": len(avd_rows),
+            "outputs_bot_pessoas": len(bot_rows), "resumos": len(resumo_rows)}
@@ -0,0 +1,110 @@
+"""Benchmark de partida a frio: quanto um processo novo leva até mostrar o login.
+
+Cada repetição roda num interpretador novo (como um container recém-criado no
+Railway) e mede:
+- o import dos módulos do app (streamlit + db, contexto, flowise...);
+- a primeira execução do app.py até a tela de login (AppTest), que é o que a
+  primeira sessão espera;
+- quais dependências pesadas (pandas, numpy, SQLAlchemy, pyarrow) ficaram
+  carregadas depois do login e de um rerun logado.
+
+Sai com 1 se a mediana do tempo até o login passar do alvo.
+
+Uso:
+    python -m bench.inicializacao                 # alvo padrão: INICIO_ALVO_S ou 0.8s
+    python -m bench.inicializacao --alvo 0.8 --repeticoes 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+PESADOS = ("pandas", "numpy", "sqlalchemy", "pyarrow")
+
+# roda no processo filho; imprime um JSON com as medidas
+_FILHO = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import streamlit
+import cache_llm, contexto, db, flowise, formatador_pdi, graph, jobs, metricas, prompts
+t_imports = time.perf_counter() - t0
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=60)
+at.run()
+t_login = time.perf_counter() - t1
+t_ate_login = time.perf_counter() - t0
+pesados_login = [m for m in PESADOS if m in sys.modules]
+
+# rerun logado, com o contexto vindo de um snapshot pronto (sem banco)
+contexto.obter_contexto = lambda email, *a, **k: contexto.ContextoUsuario(email=email, id_pessoa="0")
+at.session_state["autenticado"] = True
+at.session_state["email"] = "bench@bench.local"
+at.run()
+print(json.dumps({
+    "imports": t_imports,
+    "primeira_execucao": t_login,
+    "ate_login": t_ate_login,
+    "pesados_login": pesados_login,
+    "pesados_logado": [m for m in PESADOS if m in sys.modules],
+    "excecao": [str(e.value) for e in at.exception],
+}))
+"""
+
+
+def medir_uma() -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "postgresql://bench@127.0.0.1:1/bench")
+    env.setdefault("API_URL", "http://127.0.0.1:1/api/v1/prediction/bench")
+    for nome in ("TENANT_ID", "CLIENT_ID", "CLIENT_SECRET", "SENDER_EMAIL", "METRICAS_PORTA"):
+        env.pop(nome, None)  # sem worker da outbox nem /metrics: só o custo de subir
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", f"PESADOS = {PESADOS!r}\n" + _FILHO],
+        cwd=RAIZ, env=env, capture_output=True, text=True, timeout=300,
+    )
+    total = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    medidas = json.loads(proc.stdout.strip().splitlines()[-1])
+    medidas["processo"] = total
+    return medidas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede a partida a frio do app até a tela de login.")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--alvo", type=float, default=float(os.getenv("INICIO_ALVO_S", "0.8")),
+                        help="mediana máxima em segundos do início até o login (padrão: %(default)s)")
+    parser.add_argument("--saida", help="grava o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    rodadas = [medir_uma() for _ in range(args.repeticoes)]
+    resumo = {
+        chave: round(statistics.median(r[chave] for r in rodadas), 3)
+        for chave in ("imports", "primeira_execucao", "ate_login", "processo")
+    }
+    resumo["pesados_login"] = rodadas[-1]["pesados_login"]
+    resumo["pesados_logado"] = rodadas[-1]["pesados_logado"]
+    resumo["alvo"] = args.alvo
+
+    print(f"imports do app         {resumo['imports']:.3f}s (mediana de {args.repeticoes})")
+    print(f"primeira execução      {resumo['primeira_execucao']:.3f}s")
+    print(f"até a tela de login    {resumo['ate_login']:.3f}s  (alvo {args.alvo:.2f}s)")
+    print(f"processo inteiro       {resumo['processo']:.3f}s")
+    print(f"pesados após o login   {', '.join(resumo['pesados_login']) or 'nenhum'}")
+    print(f"pesados após um rerun  {', '.join(resumo['pesados_logado']) or 'nenhum'}")
+    if rodadas[-1]["excecao"]:
+        print(f"exceção no app: {rodadas[-1]['excecao']}")
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(resumo, indent=2), encoding="utf-8")
+    return 0 if resumo["ate_login"] <= args.alvo else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+"""Benchmark de carga/latência dos reruns do app.py.
+
+Roda o app sem navegador (streamlit.testing AppTest) contra um Postgres com
+dados sintéticos (bench/base_sintetica.py) e um Flowise/Graph falso com
+latência configurável (bench/servicos_falsos.py). Cada sessão faz o caminho
+completo: login, rerun sem interação, salvar tarefas, gerar e salvar o
+diagnóstico, competências, gerar e salvar o PDI.
+
+Mede:
+- latência p50/p95 por rerun e por passo, e consultas/chamadas HTTP por rerun
+  (fase sequencial, uma sessão por vez, para as contagens não se misturarem);
+- vazão (reruns/s) e latência com N sessões simultâneas.
+
+Uso:
+    python -m bench.reruns                                  # 200 pessoas, sessões 1 e 20
+    python -m bench.reruns --sessoes 1,50,200 --latencia-flowise 5
+    python -m bench.reruns --salvar-baseline bench/baseline.json
+    python -m bench.reruns --comparar bench/baseline.json   # sai com 1 se piorou
+
+BENCH_DATABASE_URL aponta para o banco do benchmark (nunca o de produção: as
+tabelas recebem linhas @bench.local); sem ela, sobe um Postgres local.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from psycopg2 import extensions as pg_ext
+
+from bench import base_sintetica
+from bench.servicos_falsos import ServicosFalsos
+
+APP = Path(__file__).resolve().parent.parent / "app.py"
+
+# métricas comparadas com a baseline: (caminho, maior_e_pior)
+METRICAS_BASELINE = [
+    (("sequencial", "rerun", "p50"), True),
+    (("sequencial", "rerun", "p95"), True),
+    (("sequencial", "rerun", "consultas_por_rerun"), True),
+    (("sequencial", "rerun", "http_por_rerun"), True),
+]
+
+
+# ==== CONTADORES ====
+class Contador:
+    def __init__(self):
+        self._n = 0
+        self._lock = threading.Lock()
+
+    def somar(self, n: int = 1):
+        with self._lock:
+            self._n += n
+
+    @property
+    def valor(self) -> int:
+        return self._n
+
+
+consultas = Contador()
+_cursores: dict = {}
+
+
+def _cursor_contando(base):
+    cls = _cursores.get(base)
+    if cls is None:
+        class _Cursor(base):
+            def execute(self, query, vars=None):
+                consultas.somar()
+                return super().execute(query, vars)
+        cls = _cursores[base] = _Cursor
+    return cls
+
+
+def instrumentar_banco():
+    """Conta cada execute() feito pelas conexões do pool."""
+    import db
+    original = db._ConexaoPDI.cursor
+
+    def cursor(self, *args, cursor_factory=None, **kwargs):
+        base = cursor_factory or self.cursor_factory or pg_ext.cursor
+        return original(self, *args, cursor_factory=_cursor_contando(base), **kwargs)
+
+    db._ConexaoPDI.cursor = cursor
+
+
+def permitir_apptest_concorrente():
+    """Ajustes para rodar vários AppTest em threads no mesmo processo.
+
+    O AppTest troca `config.get_option` a cada run e, com várias threads, as trocas
+    se embaralham: a opção passa a ser ligada uma vez para o processo todo. O mesmo
+    vale para o Runtime falso que cada run instala e remove: fica um só, fixo. E o
+    ast.parse do Python 3.11 não aguenta compilações simultâneas: a compilação do
+    script (uma por AppTest) fica serializada.
+    """
+    from contextlib import nullcontext
+    from unittest.mock import MagicMock
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test
+    config.set_option("global.appTest", True)
+    app_test.patch_config_options = lambda *args, **kwargs: nullcontext()
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    get_bytecode, trava = ScriptCache.get_bytecode, threading.Lock()
+
+    def get_bytecode_serializado(self, script_path):
+        with trava:
+            return get_bytecode(self, script_path)
+
+    ScriptCache.get_bytecode = get_bytecode_serializado
+
+
+def configurar_ambiente(dsn: str, servicos: ServicosFalsos):
+    """Variáveis lidas pelo app.py e pelos módulos; precisa rodar antes de importá-los."""
+    os.environ.update({
+        "DATABASE_URL": dsn,
+        "DATABASE_URL_RESUMO_SEMANAL": dsn,
+        "API_URL": servicos.api_url,
+        "TENANT_ID": "tenant-bench",
+        "CLIENT_ID": "client-bench",
+        "CLIENT_SECRET": "segredo-bench",
+        "SENDER_EMAIL": f"pdi@{base_sintetica.DOMINIO}",
+        "GRAPH_LOGIN_URL": servicos.url,
+        "GRAPH_API_URL": servicos.url,
+    })
+
+
+# ==== SESSÃO ====
+class Sessao:
+    """Uma pessoa percorrendo o app; cada passo é um rerun medido."""
+
+    def __init__(self, n: int, servicos: ServicosFalsos, usar_cache_llm: bool, timeout: float):
+        from streamlit.testing.v1 import AppTest
+        self.email = base_sintetica.email_pessoa(n)
+        self.senha = base_sintetica.id_pessoa(n)
+        self.servicos = servicos
+        self.usar_cache_llm = usar_cache_llm
+        self.at = AppTest.from_file(str(APP), default_timeout=timeout)
+        self.medidas = []      # (passo, segundos, consultas, chamadas http)
+        self.geracoes = []     # segundos do clique até o resultado aparecer
+
+    def _passo(self, nome: str, acao):
+        c0, h0, t0 = consultas.valor, self.servicos.total_chamadas(), time.perf_counter()
+        acao()
+        self.medidas.append((nome, time.perf_counter() - t0, consultas.valor - c0,
+                             self.servicos.total_chamadas() - h0))
+        if self.at.exception:
+            raise RuntimeError(f"{nome}: {self.at.exception[0].value}")
+        erros = [e.value for e in self.at.error]
+        if erros:
+            raise RuntimeError(f"{nome}: {erros[0]}")
+
+    def _botao(self, rotulo: str):
+        for botao in self.at.button:
+            if botao.label == rotulo:
+                return botao
+        raise RuntimeError(f"Botão '{rotulo}' não apareceu na página.")
+
+    def _clicar(self, nome: str, rotulo: str):
+        self._passo(nome, lambda: self._botao(rotulo).click().run())
+
+    def _gerar(self, nome: str, rotulo: str, chave_regenerar: str, tipo: str):
+        import jobs
+        if not self.usar_cache_llm:
+            self.at.checkbox(key=chave_regenerar).check()
+        chave = jobs.chave_job(tipo, f"{self.senha}:{dt.date.today().isoformat()}")
+        t0 = time.perf_counter()
+        self._clicar(nome, rotulo)
+        job = jobs.obter(chave)
+        while job is None or job.em_andamento:
+            time.sleep(0.2)
+            # equivale ao fragmento de andamento (run_every) rerodando a página
+            self._passo("acompanhar_geracao", self.at.run)
+            job = jobs.obter(chave)
+        self._passo("acompanhar_geracao", self.at.run)
+        self.geracoes.append(time.perf_counter() - t0)
+
+    def executar(self):
+        at = self.at
+        self._passo("tela_login", at.run)
+        at.text_input[0].input(self.email)
+        at.text_input[1].input(self.senha)
+        self._clicar("login", "Entrar")
+        self._passo("rerun_ocioso", at.run)
+        self._clicar("salvar_tarefas", "Salvar tarefas")
+        self._gerar("gerar_diagnostico", "Gerar Diagnóstico com IA", "regenerar_diagnostico", "diagnostico")
+        self._clicar("salvar_diagnostico", "Salvar Diagnóstico Final")
+        at.text_input(key="Competencia_PDI_1").input("Priorização")
+        self._clicar("salvar_competencias", "Salvar Competências")
+        self._gerar("gerar_pdi", "Gerar PDI com IA", "regenerar_pdi", "pdi")
+        self._clicar("salvar_pdi", "Salvar PDI Final")
+        self._passo("rerun_ocioso", at.run)
+        return self
+
+
+# ==== ESTATÍSTICAS ====
+def percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados) + 0.5) - 1))]
+
+
+def _resumo(medidas) -> dict:
+    tempos = [m[1] for m in medidas]
+    return {
+        "reruns": len(medidas),
+        "p50": round(percentil(tempos, 50), 4),
+        "p95": round(percentil(tempos, 95), 4),
+        "consultas_por_rerun": round(sum(m[2] for m in medidas) / max(len(medidas), 1), 2),
+        "http_por_rerun": round(sum(m[3] for m in medidas) / max(len(medidas), 1), 2),
+    }
+
+
+class _Pessoas:
+    """Distribui pessoas diferentes entre as sessões, para o cache de uma não servir à outra."""
+
+    def __init__(self, total: int):
+        self.total, self._prox, self._lock = total, 0, threading.Lock()
+
+    def proxima(self) -> int:
+        with self._lock:
+            n, self._prox = self._prox % self.total, self._prox + 1
+            return n
+
+
+def _aguardar_segundo_plano(servicos, quieto: float = 0.5, maximo: float = 5.0):
+    """Espera as gerações e a outbox de e-mails pararem de chamar o banco e o HTTP."""
+    limite = time.monotonic() + maximo
+    antes = None
+    while time.monotonic() < limite:
+        agora = (consultas.valor, servicos.total_chamadas())
+        if agora == antes:
+            return
+        antes = agora
+        time.sleep(quieto)
+
+
+def fase_sequencial(repeticoes: int, pessoas: _Pessoas, servicos, args) -> dict:
+    sessoes = []
+    c0, h0 = consultas.valor, servicos.total_chamadas()
+    for _ in range(repeticoes):
+        sessoes.append(Sessao(pessoas.proxima(), servicos, args.usar_cache_llm, args.timeout).executar())
+        _aguardar_segundo_plano(servicos)
+    medidas = [m for s in sessoes for m in s.medidas]
+    passos = {}
+    for nome in dict.fromkeys(m[0] for m in medidas):
+        passos[nome] = _resumo([m for m in medidas if m[0] == nome])
+    # o trabalho em segundo plano (geração, e-mail) cai em reruns quaisquer: no total
+    # entra tudo o que a fase provocou, dividido pelos reruns
+    rerun = _resumo(medidas)
+    rerun["consultas_por_rerun"] = round((consultas.valor - c0) / max(len(medidas), 1), 2)
+    rerun["http_por_rerun"] = round((servicos.total_chamadas() - h0) / max(len(medidas), 1), 2)
+    geracoes = [g for s in sessoes for g in s.geracoes]
+    return {"rerun": rerun, "passos": passos,
+            "geracao_p50": round(percentil(geracoes, 50), 3)}
+
+
+def fase_carga(n_sessoes: int, pessoas: _Pessoas, servicos, args) -> dict:
+    sessoes = [Sessao(pessoas.proxima(), servicos, args.usar_cache_llm, args.timeout) for _ in range(n_sessoes)]
+    erros = []
+
+    def rodar(sessao):
+        try:
+            sessao.executar()
+        except Exception as e:
+            erros.append(f"{sessao.email}: {e}")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_sessoes) as executor:
+        list(executor.map(rodar, sessoes))
+    duracao = time.perf_counter() - t0
+    medidas = [m for s in sessoes for m in s.medidas]
+    resumo = _resumo(medidas)
+    return {
+        "sessoes": n_sessoes,
+        "duracao": round(duracao, 3),
+        "reruns_por_s": round(len(medidas) / duracao, 2),
+        "p50": resumo["p50"],
+        "p95": resumo["p95"],
+        "erros": len(erros),
+        "primeiros_erros": erros[:3],
+    }
+
+
+# ==== BASELINE ====
+def _valor(resultado: dict, caminho):
+    for parte in caminho:
+        resultado = resultado.get(parte) if isinstance(resultado, dict) else None
+    return resultado
+
+
+def comparar(atual: dict, baseline: dict, tolerancia: float) -> list:
+    """Métricas que pioraram além da tolerância relativa."""
+    metricas = list(METRICAS_BASELINE)
+    for n in baseline.get("carga", {}):
+        metricas += [(("carga", n, "p95"), True), (("carga", n, "reruns_por_s"), False)]
+    pioras = []
+    for caminho, maior_e_pior in metricas:
+        antes, agora = _valor(baseline, caminho), _valor(atual, caminho)
+        if antes is None or agora is None:
+            continue
+        limite = antes * (1 + tolerancia) if maior_e_pior else antes * (1 - tolerancia)
+        if (agora > limite + 1e-9) if maior_e_pior else (agora < limite - 1e-9):
+            pioras.append(f"{'.'.join(caminho)}: {antes} -> {agora}")
+    return pioras
+
+
+def imprimir(resultado: dict):
+    seq = resultado["sequencial"]
+    print(f"\n== Sequencial ({resultado['parametros']['repeticoes']} sessões) ==")
+    print(f"{'passo':<22}{'reruns':>7}{'p50 (s)':>10}{'p95 (s)':>10}{'consultas':>11}{'http':>7}")
+    for nome, r in [*seq["passos"].items(), ("TOTAL", seq["rerun"])]:
+        print(f"{nome:<22}{r['reruns']:>7}{r['p50']:>10.3f}{r['p95']:>10.3f}"
+              f"{r['consultas_por_rerun']:>11.2f}{r['http_por_rerun']:>7.2f}")
+    print(f"geração (clique até o resultado) p50: {seq['geracao_p50']:.2f}s")
+    print("\n== Carga ==")
+    print(f"{'sessões':>8}{'duração (s)':>13}{'reruns/s':>10}{'p50 (s)':>10}{'p95 (s)':>10}{'erros':>7}")
+    for r in resultado["carga"].values():
+        print(f"{r['sessoes']:>8}{r['duracao']:>13.2f}{r['reruns_por_s']:>10.2f}"
+              f"{r['p50']:>10.3f}{r['p95']:>10.3f}{r['erros']:>7}")
+        for erro in r["primeiros_erros"]:
+            print(f"         ! {erro}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de reruns do app com Postgres e Flowise locais.")
+    parser.add_argument("--pessoas", type=int, default=200, help="pessoas sintéticas semeadas (padrão: 200)")
+    parser.add_argument("--sem-semear", action="store_true", help="usa os dados já semeados")
+    parser.add_argument("--projecao", action="store_true", help="aplica as migrações (projeção) antes de medir")
+    parser.add_argument("--repeticoes", type=int, default=5, help="sessões na fase sequencial (padrão: 5)")
+    parser.add_argument("--sessoes", default="1,20", help="sessões simultâneas por fase de carga (padrão: 1,20)")
+    parser.add_argument("--latencia-flowise", type=float, default=2.0, help="segundos por geração (padrão: 2)")
+    parser.add_argument("--latencia-graph", type=float, default=0.05, help="segundos por chamada ao Graph")
+    parser.add_argument("--usar-cache-llm", action="store_true",
+                        help="não marca 'gerar de novo' (gerações repetidas saem do cache)")
+    parser.add_argument("--timeout", type=float, default=60, help="timeout de cada rerun no AppTest")
+    parser.add_argument("--saida", help="grava o resultado em JSON")
+    parser.add_argument("--salvar-baseline", help="grava o resultado como baseline neste arquivo")
+    parser.add_argument("--comparar", help="compara com a baseline e sai com 1 se alguma métrica piorou")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora relativa aceita (padrão: 0.2)")
+    args = parser.parse_args(argv)
+
+    dsn = base_sintetica.dsn_benchmark()
+    if not args.sem_semear:
+        print(f"Semeando: {base_sintetica.semear(dsn, pessoas=args.pessoas)}")
+    servicos = ServicosFalsos(args.latencia_flowise, args.latencia_graph).iniciar()
+    configurar_ambiente(dsn, servicos)
+    if args.projecao:
+        import migrar
+        migrar.main([])
+    instrumentar_banco()
+    permitir_apptest_concorrente()
+
+    pessoas = _Pessoas(args.pessoas)
+    resultado = {
+        "parametros": {k: v for k, v in vars(args).items() if k not in ("saida", "salvar_baseline", "comparar")},
+        "ambiente": {"python": platform.python_version(), "maquina": platform.node(), "em": time.strftime("%F %T")},
+        "sequencial": fase_sequencial(args.repeticoes, pessoas, servicos, args),
+        "carga": {},
+    }
+    for n in [int(x) for x in args.sessoes.split(",") if x.strip()]:
+        resultado["carga"][str(n)] = fase_carga(n, pessoas, servicos, args)
+    resultado["chamadas_http"] = dict(servicos.chamadas)
+    servicos.parar()
+    imprimir(resultado)
+
+    for caminho in (args.saida, args.salvar_baseline):
+        if caminho:
+            Path(caminho).write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.comparar:
+        pioras = comparar(resultado, json.loads(Path(args.comparar).read_text(encoding="utf-8")), args.tolerancia)
+        print("\n== Comparação com a baseline ==")
+        print("\n".join(f"PIOROU {p}" for p in pioras) if pioras else "sem regressões")
+        return 1 if pioras else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
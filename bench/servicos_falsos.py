@@ -0,0 +1,127 @@
+"""Servidor HTTP local que imita o Flowise e o Microsoft Graph no benchmark.
+
+- POST /api/v1/prediction/<id>: responde JSON, ou SSE quando o corpo pede
+  `"streaming": true`, depois de `latencia_flowise` segundos (distribuídos entre
+  os tokens no streaming).
+- POST /<tenant>/oauth2/v2.0/token e /v1.0/users/<remetente>/sendMail: Graph,
+  com `latencia_graph` segundos.
+
+Conta as chamadas por rota para o benchmark calcular chamadas HTTP por rerun.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DIAGNOSTICO = """1- Resumo da pessoa até o momento: pessoa organizada e colaborativa.
+2- Gaps na posição atual: priorização e negociação de escopo.
+3- Futuro: liderança técnica do time.
+4- Indicações de pontos de desenvolvimento: priorização, comunicação executiva."""
+
+PDI = """### Competência: Priorização
+
+**Objetivo de Desenvolvimento**
+Decidir com critérios claros o que entra em cada sprint, reduzindo demandas não planejadas.
+
+**70% Atividades práticas (on the job)**
+- Conduzir a priorização do backlog a cada sprint usando uma matriz de impacto e esforço.
+- Negociar o escopo com as áreas parceiras antes do planejamento.
+
+**20% Aprendizagem com os outros**
+- Fazer mentoria quinzenal com a liderança sobre decisões de prioridade.
+
+**10% Cursos e treinamentos**
+- Curso de gestão de produto com foco em priorização.
+"""
+
+
+class ServicosFalsos:
+    def __init__(self, latencia_flowise: float = 2.0, latencia_graph: float = 0.05, host: str = "127.0.0.1"):
+        self.latencia_flowise = latencia_flowise
+        self.latencia_graph = latencia_graph
+        self.chamadas = Counter()
+        self._lock = threading.Lock()
+        servicos = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                corpo = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if "/prediction/" in self.path:
+                    servicos._contar("flowise")
+                    servicos._flowise(self, json.loads(corpo or b"{}"))
+                elif self.path.endswith("/oauth2/v2.0/token"):
+                    servicos._contar("graph_token")
+                    time.sleep(servicos.latencia_graph)
+                    self._json(200, {"access_token": "token-bench", "expires_in": 3600})
+                elif self.path.endswith("/sendMail"):
+                    servicos._contar("graph")
+                    time.sleep(servicos.latencia_graph)
+                    self._json(202, {})
+                else:
+                    self._json(404, {"erro": self.path})
+
+            def _json(self, status, dados):
+                bruto = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(bruto)))
+                self.end_headers()
+                self.wfile.write(bruto)
+
+        self._handler = _Handler
+        self._servidor = ThreadingHTTPServer((host, 0), _Handler)
+        self._servidor.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/api/v1/prediction/bench"
+
+    def _contar(self, rota: str):
+        with self._lock:
+            self.chamadas[rota] += 1
+
+    def total_chamadas(self) -> int:
+        with self._lock:
+            return sum(self.chamadas.values())
+
+    def _flowise(self, handler, pedido: dict):
+        pergunta = pedido.get("question") or ""
+        texto = PDI if "Plano de Desenvolvimento Individual" in pergunta else DIAGNOSTICO
+        if not pedido.get("streaming"):
+            time.sleep(self.latencia_flowise)
+            handler._json(200, {"text": texto})
+            return
+        tokens = texto.split(" ")
+        pausa = self.latencia_flowise / max(len(tokens), 1)
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        for i, token in enumerate(tokens):
+            time.sleep(pausa)
+            trecho = token if i == 0 else " " + token
+            handler.wfile.write(f"data: {json.dumps({'event': 'token', 'data': trecho}, ensure_ascii=False)}\n\n".encode("utf-8"))
+            handler.wfile.flush()
+        handler.wfile.write(b'data: {"event": "end", "data": "[DONE]"}\n\n')
+        handler.close_connection = True
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._servidor.serve_forever, name="servicos-falsos", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
@@ -0,0 +1,98 @@
+"""Cache das gerações do LLM endereçado pelo conteúdo (hash do prompt + endpoint).
+
+Fica no Postgres para sobreviver a restarts e ser compartilhado entre réplicas.
+Entradas expiram por TTL e, acima do limite de tamanho, as menos usadas saem primeiro.
+"""
+import hashlib
+import logging
+import os
+
+import db
+
+log = logging.getLogger(__name__)
+
+LLM_CACHE_TTL_DIAS = int(os.getenv("LLM_CACHE_TTL_DIAS", "30"))
+LLM_CACHE_MAX = int(os.getenv("LLM_CACHE_MAX", "5000"))
+
+SQL_CRIAR = """
+    CREATE TABLE IF NOT EXISTS cache_geracoes_llm (
+        chave       text PRIMARY KEY,
+        endpoint    text NOT NULL,
+        resposta    text NOT NULL,
+        criado_em   timestamptz NOT NULL DEFAULT now(),
+        ultimo_uso  timestamptz NOT NULL DEFAULT now(),
+        acessos     integer NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS cache_geracoes_llm_ultimo_uso_idx
+        ON cache_geracoes_llm (ultimo_uso);
+"""
+SQL_BUSCAR = """
+    UPDATE cache_geracoes_llm
+       SET ultimo_uso = now(), acessos = acessos + 1
+     WHERE chave = $1
+       AND criado_em >= now() - make_interval(days => $2)
+    RETURNING resposta
+"""
+SQL_GRAVAR = """
+    INSERT INTO cache_geracoes_llm (chave, endpoint, resposta)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (chave) DO UPDATE
+       SET resposta = EXCLUDED.resposta, criado_em = now(), ultimo_uso = now()
+"""
+SQL_EXPIRAR = """
+    DELETE FROM cache_geracoes_llm
+     WHERE criado_em < now() - make_interval(days => $1)
+        OR chave IN (
+            SELECT chave FROM cache_geracoes_llm
+            ORDER BY ultimo_uso DESC
+            OFFSET $2
+        )
+"""
+
+def chave_prompt(endpoint: str, prompt: str) -> str:
+    return hashlib.sha256(f"{endpoint}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+def buscar(dsn: str, endpoint: str, prompt: str):
+    """Resposta guardada para o prompt, ou None."""
+    with db.conexao(dsn) as conn:
+        db.garantir_ddl(conn, SQL_CRIAR)
+        with conn.cursor() as cur:
+            db.executar_preparado(cur, "pdi_cache_buscar", SQL_BUSCAR,
+                                  (chave_prompt(endpoint, prompt), LLM_CACHE_TTL_DIAS))
+            row = cur.fetchone()
+    return row[0] if row else None
+
+
+def gravar(dsn: str, endpoint: str, prompt: str, resposta: str):
+    with db.conexao(dsn) as conn:
+        db.garantir_ddl(conn, SQL_CRIAR)
+        with conn.cursor() as cur:
+            db.executar_preparado(cur, "pdi_cache_gravar", SQL_GRAVAR,
+                                  (chave_prompt(endpoint, prompt), endpoint, resposta))
+            db.executar_preparado(cur, "pdi_cache_expirar", SQL_EXPIRAR,
+                                  (LLM_CACHE_TTL_DIAS, LLM_CACHE_MAX))
+
+
+def gerar_com_cache(dsn: str, gerar, endpoint: str, prompt: str, *args,
+                    regenerar: bool = False, **kwargs) -> str:
+    """`gerar(endpoint, prompt, *args, **kwargs)` passando pelo cache.
+
+    Com `regenerar=True` ignora o que estiver guardado e sobrescreve com a nova resposta.
+    Falhas no cache nunca impedem a geração.
+    """
+    if not regenerar:
+        try:
+            resposta = buscar(dsn, endpoint, prompt)
+            if resposta is not None:
+                return resposta
+        except Exception:
+            log.warning("Falha ao consultar o cache de gerações", exc_info=True)
+
+    resposta = gerar(endpoint, prompt, *args, **kwargs)
+    if resposta and resposta.strip():
+        try:
+            gravar(dsn, endpoint, prompt, resposta)
+        except Exception:
+            log.warning("Falha ao gravar no cache de gerações", exc_info=True)
+    return resposta
@@ -0,0 +1,171 @@
+"""Retenção do histórico de dados_AVD_pessoas.
+
+Mantém as N versões mais recentes de cada (email, informação normalizada) e
+move as mais antigas para a tabela de arquivo `dados_avd_arquivo` (mesmas
+colunas + arquivado_em, só com índice por e-mail), no mesmo schema. Anda por
+lotes de e-mails, cada lote numa transação curta (DELETE ... RETURNING direto
+no INSERT do arquivo), com lock_timeout para nunca ficar preso atrás do app.
+
+Uso:
+    python compactar_historico.py --simular           # só mostra o que sairia
+    python compactar_historico.py --manter 5
+    python compactar_historico.py --manter 3 --lote 200 --pausa 0.5 --vacuum
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+from psycopg2 import sql as psql
+
+import db
+
+log = logging.getLogger("compactar_historico")
+
+TABELA_ARQUIVO = "dados_avd_arquivo"
+
+SQL_CRIAR_ARQUIVO = """
+    CREATE TABLE IF NOT EXISTS {arq} (LIKE {tbl}, arquivado_em timestamptz NOT NULL DEFAULT now());
+    CREATE INDEX IF NOT EXISTS dados_avd_arquivo_email_idx ON {arq} (email);
+"""
+SQL_EMAILS = """
+    SELECT DISTINCT email
+    FROM {tbl}
+    WHERE email > %(depois_de)s
+    ORDER BY email
+    LIMIT %(lote)s
+"""
+# versões além das `manter` mais recentes, por (email, informação normalizada), no lote de e-mails
+SQL_ALVO = """
+    WITH alvo AS (
+        SELECT ctid, bytes
+        FROM (
+            SELECT ctid, pg_column_size(t.*) AS bytes,
+                   row_number() OVER (
+                       PARTITION BY email, trim(lower(informacao))
+                       ORDER BY data DESC NULLS LAST
+                   ) AS versao
+            FROM {tbl} t
+            WHERE email = ANY(%(emails)s)
+        ) v
+        WHERE versao > %(manter)s
+    )
+"""
+SQL_CONTAR = SQL_ALVO + """
+    SELECT count(*), coalesce(sum(bytes), 0) FROM alvo
+"""
+SQL_MOVER = SQL_ALVO + """
+    , movidos AS (
+        DELETE FROM {tbl} d
+        USING alvo
+        WHERE d.email = ANY(%(emails)s)
+          AND d.ctid = alvo.ctid
+        RETURNING d.*
+    ), arquivados AS (
+        INSERT INTO {arq}
+        SELECT m.*, now() FROM movidos m
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM arquivados), (SELECT coalesce(sum(bytes), 0) FROM alvo)
+"""
+
+
+def _marcadores(conn) -> dict:
+    schema, table = db.tabela_avd(conn)
+    return {
+        "tbl": psql.SQL("{}.{}").format(psql.Identifier(schema), psql.Identifier(table)),
+        "arq": psql.SQL("{}.{}").format(psql.Identifier(schema), psql.Identifier(TABELA_ARQUIVO)),
+    }
+
+
+def _tamanho(conn, marcadores) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_total_relation_size(%s::regclass)", (marcadores["tbl"].as_string(conn),))
+        return cur.fetchone()[0]
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1024 / 1024:,.1f} MB"
+
+
+def compactar(dsn: str, manter: int, lote: int, pausa: float, simular: bool) -> dict:
+    """Percorre os e-mails em lotes; devolve linhas e bytes movidos (ou que seriam, ao simular)."""
+    with db.conexao(dsn) as conn:
+        marcadores = _marcadores(conn)
+        antes = _tamanho(conn, marcadores)
+        if not simular:
+            with conn.cursor() as cur:
+                cur.execute(psql.SQL(SQL_CRIAR_ARQUIVO).format(**marcadores))
+
+    consulta = psql.SQL(SQL_CONTAR if simular else SQL_MOVER).format(**marcadores)
+    total = {"linhas": 0, "bytes": 0, "emails": 0, "lotes": 0, "tamanho_antes": antes}
+    depois_de = ""
+    while True:
+        with db.conexao(dsn) as conn, conn.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = '5s'")
+            cur.execute(psql.SQL(SQL_EMAILS).format(**marcadores), {"depois_de": depois_de, "lote": lote})
+            emails = [r[0] for r in cur.fetchall()]
+            if not emails:
+                break
+            cur.execute(consulta, {"emails": emails, "manter": manter})
+            linhas, bytes_ = cur.fetchone()
+        depois_de = emails[-1]
+        total["linhas"] += linhas
+        total["bytes"] += bytes_
+        total["emails"] += len(emails)
+        total["lotes"] += 1
+        log.info("lote %s: %s e-mails até %s, %s linhas (%s)%s", total["lotes"], len(emails), depois_de,
+                 linhas, _mb(bytes_), " [simulação]" if simular else "")
+        if pausa and not simular:
+            time.sleep(pausa)
+    return total
+
+
+def vacuum(dsn: str):
+    """VACUUM (ANALYZE) na tabela: deixa o espaço das linhas removidas livre para reuso."""
+    with db.conexao(dsn) as conn:
+        marcadores = _marcadores(conn)
+        conn.commit()
+        conn.autocommit = True  # VACUUM não roda dentro de transação
+        try:
+            with conn.cursor() as cur:
+                cur.execute(psql.SQL("VACUUM (ANALYZE) {tbl}").format(**marcadores))
+        finally:
+            conn.autocommit = False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arquiva as versões antigas de dados_AVD_pessoas.")
+    parser.add_argument("--manter", type=int, default=5,
+                        help="versões mais recentes mantidas por (email, informação) (padrão: 5)")
+    parser.add_argument("--lote", type=int, default=500, help="e-mails por transação (padrão: 500)")
+    parser.add_argument("--pausa", type=float, default=0.2, help="segundos entre lotes (padrão: 0.2)")
+    parser.add_argument("--simular", action="store_true", help="só conta o que seria arquivado")
+    parser.add_argument("--vacuum", action="store_true", help="roda VACUUM (ANALYZE) no fim")
+    args = parser.parse_args(argv)
+    if args.manter < 1:
+        parser.error("--manter precisa ser pelo menos 1 (a versão atual nunca sai)")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    dsn = (os.getenv("DATABASE_URL") or "").strip()
+    if not dsn:
+        sys.exit("Variável 'DATABASE_URL' não está definida.")
+
+    total = compactar(dsn, args.manter, args.lote, args.pausa, args.simular)
+    verbo = "seriam arquivadas" if args.simular else "arquivadas"
+    print(f"{total['emails']} e-mails em {total['lotes']} lotes; {total['linhas']} linhas {verbo} "
+          f"({_mb(total['bytes'])} de dados)")
+    print(f"tamanho da tabela antes: {_mb(total['tamanho_antes'])}")
+    if not args.simular:
+        if args.vacuum:
+            vacuum(dsn)
+        with db.conexao(dsn) as conn:
+            depois = _tamanho(conn, _marcadores(conn))
+        print(f"tamanho da tabela depois: {_mb(depois)}"
+              + ("" if args.vacuum else " (o espaço só volta a ser reaproveitado depois do VACUUM)"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
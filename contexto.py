@@ -0,0 +1,308 @@
+"""Snapshot do contexto de um usuário (perfil, histórico do bot, resumos semanais e últimas infos).
+
+Tudo que o app precisa do banco depois do login é buscado em uma ida por banco
+(o perfil sai do diretório em memória) e guardado por e-mail com TTL; reruns
+que não salvam nada não tocam no Postgres. Com várias réplicas, o snapshot de
+um processo pode ficar para trás de um salvamento feito em outro: quem pede
+`validar=True` confere antes a data da última informação gravada no banco.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from psycopg2.extras import RealDictCursor
+
+import db
+import diretorio
+
+log = logging.getLogger(__name__)
+
+CONTEXTO_TTL = float(os.getenv("CONTEXTO_TTL", "300"))  # segundos
+CONTEXTO_VALIDAR = float(os.getenv("CONTEXTO_VALIDAR", "30"))  # segundos entre conferências do snapshot na sessão
+CONTEXTO_TTL_ERRO = float(os.getenv("CONTEXTO_TTL_ERRO", "15"))  # segundos de um snapshot que veio com erro
+
+# ==== TIPOS ====
+INFO_TAGS_PF   = "tags pontos fortes"
+INFO_TAGS_PD   = "tags pontos desenvolvimento"
+INFO_OBJETIVOS = "objetivos de carreira"
+INFO_TAREFAS   = "tarefas cargo (autoavaliação)"
+INFO_DIAGNOSTICO = "diagnostico pdi"
+
+TIPOS_CANON = [
+    INFO_TAGS_PF,
+    INFO_TAGS_PD,
+    "resumo avd",
+    "output_feedback",
+    "output_pdi",
+    INFO_OBJETIVOS,
+    INFO_TAREFAS,
+    INFO_DIAGNOSTICO,
+]
+
+SEM_HISTORICO_BOT = "Não há nenhuma interação até o momento"
+
+# histórico do bot + últimas infos numa única consulta (json por bloco); o perfil vem do diretório
+SQL_CONTEXTO = """
+    SELECT
+        (SELECT coalesce(json_agg(h ORDER BY h.data DESC), '[]'::json) FROM (
+            SELECT data, output_pessoa_bot
+            FROM outputs_bot_pessoas
+            WHERE email = $1
+              AND data >= $2
+            ORDER BY data DESC
+            LIMIT 5
+        ) h) AS historico,
+        (SELECT coalesce(json_agg(i), '[]'::json) FROM (
+            SELECT info_norm, descricao, data
+            FROM {ult}
+            WHERE email = $1
+        ) i) AS infos
+"""
+# enquanto a migração da projeção não roda: último valor calculado sobre o histórico inteiro
+SQL_CONTEXTO_HISTORICO = SQL_CONTEXTO.replace("""
+            SELECT info_norm, descricao, data
+            FROM {ult}
+            WHERE email = $1
+""", """
+            SELECT DISTINCT ON (info_norm)
+                   info_norm, descricao, data
+            FROM (
+                SELECT trim(lower(informacao)) AS info_norm,
+                       descricao, data
+                FROM {tbl}
+                WHERE email = $1
+            ) t
+            ORDER BY info_norm, data DESC NULLS LAST
+""")
+
+# várias informações de uma vez: um único INSERT multi-linha, qualquer que seja a quantidade
+SQL_INSERIR_INFOS = """
+    INSERT INTO {tbl} (email, informacao, descricao, data)
+    SELECT $1, t.informacao, t.descricao, $4
+    FROM unnest($2::text[], $3::text[]) AS t(informacao, descricao)
+"""
+# mesmo INSERT, atualizando a projeção do último valor no mesmo comando
+SQL_INSERIR_INFOS_PROJECAO = """
+    WITH novos AS (
+        INSERT INTO {tbl} (email, informacao, descricao, data)
+        SELECT $1, t.informacao, t.descricao, $4
+        FROM unnest($2::text[], $3::text[]) AS t(informacao, descricao)
+        RETURNING email, informacao, descricao, data
+    )
+    INSERT INTO {ult} AS u (email, info_norm, informacao, descricao, data)
+    SELECT DISTINCT ON (trim(lower(informacao)))
+           email, trim(lower(informacao)), informacao, descricao, data
+    FROM novos
+    ORDER BY trim(lower(informacao))
+    ON CONFLICT (email, info_norm) DO UPDATE
+       SET informacao = EXCLUDED.informacao,
+           descricao  = EXCLUDED.descricao,
+           data       = EXCLUDED.data
+     WHERE u.data IS NULL OR EXCLUDED.data >= u.data
+"""
+
+# só a projeção, para a gravação que começou antes de a migração dela terminar
+SQL_ATUALIZAR_ULTIMOS = """
+    INSERT INTO {ult} AS u (email, info_norm, informacao, descricao, data)
+    SELECT DISTINCT ON (trim(lower(t.informacao)))
+           $1, trim(lower(t.informacao)), t.informacao, t.descricao, $4
+    FROM unnest($2::text[], $3::text[]) AS t(informacao, descricao)
+    ORDER BY trim(lower(t.informacao))
+    ON CONFLICT (email, info_norm) DO UPDATE
+       SET informacao = EXCLUDED.informacao,
+           descricao  = EXCLUDED.descricao,
+           data       = EXCLUDED.data
+     WHERE u.data IS NULL OR EXCLUDED.data >= u.data
+"""
+
+# data da última informação gravada: o snapshot está em dia se for a mesma
+SQL_MARCO = """
+    SELECT max(data) FROM {ult} WHERE email = $1
+"""
+SQL_MARCO_HISTORICO = """
+    SELECT max(data) FROM {tbl} WHERE email = $1
+"""
+
+SQL_RESUMOS = """
+    SELECT summary, "timestamp"
+    FROM resumos
+    WHERE employee_email = $1
+      AND "timestamp" >= $2
+    ORDER BY "timestamp" ASC
+"""
+
+
+def _norm(informacao: str) -> str:
+    return (informacao or "").strip().lower()
+
+
+def _como_datetime(valor):
+    if isinstance(valor, str):
+        try:
+            return datetime.fromisoformat(valor)
+        except ValueError:
+            return None
+    return valor
+
+
+@dataclass
+class ContextoUsuario:
+    email: str
+    id_pessoa: Optional[str] = None
+    resumo_pessoa: Optional[str] = None
+    cargo_pessoa: Optional[str] = None
+    historico_bot: str = ""
+    resumos: list = field(default_factory=list)  # [(datetime, resumo)] em ordem cronológica
+    infos: dict = field(default_factory=dict)   # info_norm -> (descricao, data)
+    erros: list = field(default_factory=list)
+    banco_ok: bool = True
+    marco: Optional[datetime] = None  # data mais recente entre as infos
+    carregado_em: float = field(default_factory=time.monotonic)
+
+    def info(self, informacao: str):
+        """(descricao, data) mais recentes da informação, ou ("", None)."""
+        return self.infos.get(_norm(informacao), ("", None))
+
+
+def _carregar_principal(ctx: ContextoUsuario, dsn: str, dias_bot: int):
+    pessoa = diretorio.buscar(dsn, ctx.email)
+    if pessoa is not None:
+        ctx.id_pessoa, ctx.resumo_pessoa, ctx.cargo_pessoa = pessoa.id, pessoa.resumo_pessoa, pessoa.posicao
+
+    data_limite = date.today() - timedelta(days=dias_bot)
+    with db.conexao(dsn) as conn:
+        if db.projecao_disponivel(conn):
+            nome, consulta = "pdi_contexto", SQL_CONTEXTO
+        else:
+            nome, consulta = "pdi_contexto_historico", SQL_CONTEXTO_HISTORICO
+        rows = db.executar_avd(conn, nome, consulta, (ctx.email, data_limite),
+                               cursor_factory=RealDictCursor)
+    row = rows[0] if rows else {}
+
+    historico = row.get("historico") or []
+    if historico:
+        ctx.historico_bot = '; '.join(
+            f"data: {_como_datetime(h['data']).strftime('%Y-%m-%d')} - resumo: {h.get('output_pessoa_bot') or ''}"
+            for h in historico
+        )
+    else:
+        ctx.historico_bot = SEM_HISTORICO_BOT
+
+    for i in row.get("infos") or []:
+        ctx.infos[_norm(i.get("info_norm"))] = (i.get("descricao") or "", _como_datetime(i.get("data")))
+    ctx.marco = max((d for _, d in ctx.infos.values() if d is not None), default=None)
+
+
+def _carregar_resumos(ctx: ContextoUsuario, dsn: str, dias_resumos: int):
+    data_limite = datetime.now() - timedelta(days=dias_resumos)
+    with db.conexao(dsn) as conn, conn.cursor() as cur:
+        db.executar_preparado(cur, "pdi_resumos", SQL_RESUMOS, (ctx.email, data_limite))
+        rows = cur.fetchall()
+    ctx.resumos = [
+        (ts, str(sm or "").strip())
+        for sm, ts in ((sm, _como_datetime(ts)) for sm, ts in rows)
+        if ts is not None
+    ]
+
+
+def carregar_contexto(email: str, dsn: str, dsn_resumos: Optional[str],
+                      dias_bot: int, dias_resumos: int) -> ContextoUsuario:
+    """Busca o contexto completo: uma ida ao banco principal e uma ao de resumos (sem DSN próprio, o principal)."""
+    ctx = ContextoUsuario(email=email)
+    try:
+        _carregar_principal(ctx, dsn, dias_bot)
+    except Exception as e:
+        ctx.banco_ok = False
+        ctx.erros.append(f"[ERRO] Falha ao acessar banco: {e}")
+    try:
+        _carregar_resumos(ctx, dsn_resumos or dsn, dias_resumos)
+    except Exception as e:
+        ctx.erros.append(f"[ERRO] Falha ao buscar resumos semanais: {e}")
+    return ctx
+
+
+# ==== CACHE POR E-MAIL ====
+_lock = threading.Lock()
+_cache: dict = {}
+
+
+def _marco_banco(dsn: str, email: str):
+    with db.conexao(dsn) as conn:
+        if db.projecao_disponivel(conn):
+            rows = db.executar_avd(conn, "pdi_contexto_marco", SQL_MARCO, (email,))
+        else:
+            rows = db.executar_avd(conn, "pdi_contexto_marco_historico", SQL_MARCO_HISTORICO, (email,))
+    return rows[0][0] if rows else None
+
+
+def _em_dia(ctx: ContextoUsuario, dsn: str) -> bool:
+    try:
+        return _marco_banco(dsn, ctx.email) == ctx.marco
+    except Exception:
+        log.warning("Falha ao conferir o snapshot de %s; segue com o do cache", ctx.email, exc_info=True)
+        return True
+
+
+def obter_contexto(email: str, dsn: str, dsn_resumos: Optional[str],
+                   dias_bot: int, dias_resumos: int, ttl: float = CONTEXTO_TTL,
+                   validar: bool = False) -> ContextoUsuario:
+    """Snapshot do cache se ainda estiver no TTL; senão recarrega.
+
+    Snapshot com erro (ex.: banco de resumos fora) vale só CONTEXTO_TTL_ERRO, para
+    os prompts não seguirem sem os resumos pelo TTL inteiro. Com `validar=True`, o
+    snapshot do cache só é usado se nada foi gravado para o e-mail depois dele
+    (por outra réplica, por exemplo).
+    """
+    ctx = _cache.get(email)
+    if ctx is not None and time.monotonic() - ctx.carregado_em < (min(ttl, CONTEXTO_TTL_ERRO) if ctx.erros else ttl) \
+            and (not validar or _em_dia(ctx, dsn)):
+        return ctx
+    ctx = carregar_contexto(email, dsn, dsn_resumos, dias_bot, dias_resumos)
+    if ctx.banco_ok:
+        # falha no banco principal não entra no cache: o próximo rerun tenta de novo
+        with _lock:
+            _cache[email] = ctx
+    return ctx
+
+
+def inserir_infos(dsn: str, email: str, pares):
+    """Acrescenta uma versão de cada (informacao, descricao) numa única transação e atualiza o snapshot."""
+    pares = [(informacao, descricao.strip()) for informacao, descricao in pares]
+    if not pares:
+        return
+    agora = datetime.now()
+    params = (email, [i for i, _ in pares], [d for _, d in pares], agora)
+    with db.conexao(dsn) as conn:
+        if db.projecao_disponivel(conn):
+            db.executar_avd(conn, "pdi_inserir_infos_projecao", SQL_INSERIR_INFOS_PROJECAO, params)
+        else:
+            db.executar_avd(conn, "pdi_inserir_infos", SQL_INSERIR_INFOS, params)
+            # confere o catálogo de novo depois do INSERT: a migração trava o histórico em modo
+            # SHARE antes de criar a projeção, então ou ela já enxergou esta linha no backfill
+            # ou já terminou e a projeção aparece aqui
+            if db.projecao_disponivel(conn, rechecar=True):
+                db.executar_avd(conn, "pdi_atualizar_ultimos", SQL_ATUALIZAR_ULTIMOS, params)
+    for informacao, descricao in pares:
+        registrar_info(email, informacao, descricao, agora)
+
+
+def inserir_info(dsn: str, email: str, informacao: str, descricao: str):
+    inserir_infos(dsn, email, [(informacao, descricao)])
+
+
+def registrar_info(email: str, informacao: str, descricao: str, data: datetime):
+    """Atualiza só a informação salva no snapshot em cache (o resto continua válido)."""
+    ctx = _cache.get(email)
+    if ctx is not None:
+        with _lock:
+            ctx.infos[_norm(informacao)] = (descricao, data)
+            ctx.marco = data if ctx.marco is None else max(ctx.marco, data)
+
+
+def invalidar(email: str):
+    with _lock:
+        _cache.pop(email, None)
@@ -0,0 +1,241 @@
+"""Camada de acesso ao Postgres compartilhada pelo processo.
+
+O Streamlit reexecuta o app.py a cada interação, mas módulos importados ficam
+vivos no processo: por isso os pools moram aqui e são criados uma única
+vez, servindo todas as sessões.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import errors as pg_errors
+from psycopg2 import extensions as pg_ext
+from psycopg2 import pool as pg_pool
+from psycopg2 import sql as psql
+
+import metricas
+
+# ==== PARÂMETROS DO POOL ====
+POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "10"))        # segundos esperando uma conexão livre
+POOL_PING_APOS = float(os.getenv("PG_POOL_PING_APOS", "30"))    # segundos ociosa antes de testar com SELECT 1
+
+
+class PoolEsgotado(RuntimeError):
+    """Nenhuma conexão ficou livre dentro do tempo de checkout."""
+
+
+class _ConexaoPDI(pg_ext.connection):
+    """Conexão com metadados usados pelo pool (último uso, statements preparados)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ultimo_uso = time.monotonic()
+        self.preparados = set()
+
+
+class PoolPG:
+    """Pool limitado de conexões psycopg2 com timeout de checkout e health check."""
+
+    def __init__(self, dsn: str, minconn: int = POOL_MIN, maxconn: int = POOL_MAX,
+                 timeout: float = POOL_TIMEOUT, ping_apos: float = POOL_PING_APOS):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.ping_apos = ping_apos
+        self._vagas = threading.BoundedSemaphore(maxconn)
+        self._pool = pg_pool.ThreadedConnectionPool(
+            minconn, maxconn, dsn, connection_factory=_ConexaoPDI
+        )
+
+    @staticmethod
+    def _saudavel(conn) -> bool:
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        conn = self._pool.getconn()
+        ociosa = time.monotonic() - conn.ultimo_uso
+        if conn.closed or (ociosa > self.ping_apos and not self._saudavel(conn)):
+            # conexão morta (restart do banco, idle timeout do proxy...): troca por uma nova
+            self._pool.putconn(conn, close=True)
+            conn = self._pool.getconn()
+        return conn
+
+    @contextmanager
+    def conexao(self):
+        """Empresta uma conexão: commit ao sair normalmente, rollback em caso de erro."""
+        conn, descartar = None, False
+        with metricas.span("db", "checkout"):
+            if not self._vagas.acquire(timeout=self.timeout):
+                raise PoolEsgotado(f"Nenhuma conexão livre em {self.timeout:.0f}s (máx. {self.maxconn}).")
+            try:
+                conn = self._checkout()
+            except BaseException:
+                self._vagas.release()
+                raise
+        try:
+            yield conn
+            conn.commit()
+        except BaseException as e:
+            if conn is not None and not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    descartar = True
+            descartar = descartar or isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            raise
+        finally:
+            if conn is not None:
+                conn.ultimo_uso = time.monotonic()
+                self._pool.putconn(conn, close=descartar or conn.closed)
+            self._vagas.release()
+
+    def fechar(self):
+        self._pool.closeall()
+
+
+# ==== REGISTRO POR PROCESSO ====
+_lock = threading.Lock()
+_pools: dict = {}
+
+
+def get_pool(dsn: str) -> PoolPG:
+    """Retorna o pool do processo para o DSN, criando-o na primeira chamada."""
+    pool = _pools.get(dsn)
+    if pool is None:
+        with _lock:
+            pool = _pools.get(dsn)
+            if pool is None:
+                pool = _pools[dsn] = PoolPG(dsn)
+    return pool
+
+
+def conexao(dsn: str):
+    """Atalho: `with db.conexao(DATABASE_URL) as conn: ...`"""
+    return get_pool(dsn).conexao()
+
+
+# ==== DDL SOB DEMANDA ====
+_ddl_lock = threading.Lock()
+_ddl_aplicado: set = set()
+
+
+def garantir_ddl(conn, ddl: str):
+    """Roda um DDL idempotente (CREATE ... IF NOT EXISTS) uma vez por processo e banco."""
+    chave = (conn.dsn, ddl)
+    if chave in _ddl_aplicado:
+        return
+    with _ddl_lock:
+        if chave not in _ddl_aplicado:
+            with conn.cursor() as cur:
+                cur.execute(ddl)
+            conn.commit()
+            _ddl_aplicado.add(chave)
+
+
+# ==== TABELA dados_AVD_pessoas ====
+TABELA_AVD = "dados_AVD_pessoas"
+TABELA_ULTIMOS = "dados_avd_ultimos"  # projeção do último valor por (email, informação); ver migrations/
+PROJECAO_RECHECAR = 60  # segundos até procurar de novo a projeção quando ela ainda não existe
+_tabelas: dict = {}
+_sem_projecao: dict = {}
+
+
+def tabela_avd(conn, alvo: str = TABELA_AVD):
+    """(schema, tabela) reais do alvo; consulta o pg_catalog só na primeira vez por processo."""
+    chave = (conn.dsn, alvo.lower())
+    achada = _tabelas.get(chave)
+    if achada is None:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT schemaname, tablename
+                FROM pg_catalog.pg_tables
+                WHERE lower(tablename) = lower(%s)
+                ORDER BY (schemaname = 'public') DESC, schemaname, tablename
+                LIMIT 1;
+            """, (alvo,))
+            row = cur.fetchone()
+        if not row:
+            raise RuntimeError("Tabela não encontrada")
+        achada = _tabelas[chave] = (row[0], row[1])
+    return achada
+
+
+def invalidar_tabela(conn, alvo: str = TABELA_AVD):
+    _tabelas.pop((conn.dsn, alvo.lower()), None)
+
+
+def projecao_disponivel(conn, rechecar: bool = False) -> bool:
+    """A migração da projeção dados_avd_ultimos já foi aplicada neste banco?
+
+    O "não" fica guardado por PROJECAO_RECHECAR segundos (basta para as leituras, que
+    caem no histórico); quem grava passa `rechecar=True` e consulta o catálogo na hora.
+    """
+    if not rechecar and time.monotonic() < _sem_projecao.get(conn.dsn, 0.0):
+        return False
+    try:
+        tabela_avd(conn, TABELA_ULTIMOS)
+        _sem_projecao.pop(conn.dsn, None)
+        return True
+    except RuntimeError:
+        _sem_projecao[conn.dsn] = time.monotonic() + PROJECAO_RECHECAR
+        return False
+
+
+# ==== STATEMENTS PREPARADOS ====
+def executar_preparado(cur, nome: str, consulta, params=()):
+    """Prepara `consulta` (parâmetros $1, $2...) uma vez por conexão e executa com `params`."""
+    conn = cur.connection
+    if nome not in conn.preparados:
+        if not isinstance(consulta, psql.Composable):
+            consulta = psql.SQL(consulta)
+        with metricas.span("db", f"{nome}:prepare"):
+            cur.execute(psql.SQL("PREPARE {} AS ").format(psql.Identifier(nome)) + consulta)
+        conn.preparados.add(nome)
+    marcadores = ", ".join(["%s"] * len(params))
+    with metricas.span("db", nome) as s:
+        cur.execute(f'EXECUTE "{nome}"' + (f" ({marcadores})" if params else ""), params)
+        s.medir(linhas=max(cur.rowcount, 0))
+
+
+def descartar_preparados(conn):
+    with conn.cursor() as cur:
+        cur.execute("DEALLOCATE ALL")
+    conn.preparados.clear()
+
+
+def executar_avd(conn, nome: str, modelo: str, params=(), cursor_factory=None):
+    """Executa uma consulta preparada sobre dados_AVD_pessoas (`{tbl}` no modelo; `{ult}` é a projeção).
+
+    Se a tabela sumiu ou mudou de schema, redescobre, descarta os preparados e tenta de novo uma vez.
+    Retorna as linhas (lista vazia para comandos sem resultado).
+    """
+    alvos = {"tbl": TABELA_AVD}
+    if "{ult}" in modelo:
+        alvos["ult"] = TABELA_ULTIMOS
+    for tentativa in (1, 2):
+        nomes = {}
+        for marcador, alvo in alvos.items():
+            schema, table = tabela_avd(conn, alvo)
+            nomes[marcador] = psql.SQL("{}.{}").format(psql.Identifier(schema), psql.Identifier(table))
+        try:
+            with conn.cursor(cursor_factory=cursor_factory) as cur:
+                executar_preparado(cur, nome, psql.SQL(modelo).format(**nomes), params)
+                return cur.fetchall() if cur.description else []
+        except (pg_errors.UndefinedTable, pg_errors.InvalidSqlStatementName):
+            if tentativa == 2:
+                raise
+            conn.rollback()
+            for alvo in alvos.values():
+                invalidar_tabela(conn, alvo)
+            descartar_preparados(conn)
@@ -0,0 +1,156 @@
+"""Diretório em memória de pessoas_ativos (email -> id, resumo_pessoa, posicao).
+
+Login e perfil leem daqui. A tabela inteira é carregada uma vez por processo
+e, a cada DIRETORIO_INTERVALO segundos, só as linhas alteradas desde a última
+leitura (pelo xmin das linhas) são buscadas de novo, na mesma ida em que se
+confere a contagem: se ela não bater (alguém saiu da tabela), recarrega tudo.
+A atualização é feita por quem chegar primeiro depois do intervalo; os demais
+continuam com o que já está em memória. E-mail que não está no diretório é
+procurado direto no banco.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from psycopg2.extras import RealDictCursor
+
+import db
+
+log = logging.getLogger(__name__)
+
+DIRETORIO_INTERVALO = float(os.getenv("DIRETORIO_INTERVALO", "60"))  # segundos entre atualizações
+
+SQL_CARGA = """
+    SELECT txid_snapshot_xmin(txid_current_snapshot()) AS marco,
+           email, id, resumo_pessoa, posicao
+    FROM pessoas_ativos
+    WHERE email IS NOT NULL
+"""
+# linhas inseridas/alteradas por transações a partir do marco da leitura anterior
+SQL_DELTA = """
+    SELECT txid_snapshot_xmin(txid_current_snapshot()) AS marco,
+           (SELECT count(DISTINCT email) FROM pessoas_ativos WHERE email IS NOT NULL) AS total,
+           (SELECT coalesce(json_agg(p), '[]'::json) FROM (
+               SELECT email, id, resumo_pessoa, posicao
+               FROM pessoas_ativos
+               WHERE email IS NOT NULL
+                 AND age(xmin) <= txid_current() - $1 + 1
+           ) p) AS alterados
+"""
+SQL_PESSOA = """
+    SELECT email, id, resumo_pessoa, posicao
+    FROM pessoas_ativos
+    WHERE email = $1
+    LIMIT 1
+"""
+
+
+@dataclass(frozen=True)
+class Pessoa:
+    email: str
+    id: Optional[str]
+    resumo_pessoa: Optional[str]
+    posicao: Optional[str]
+
+
+def _pessoa(row) -> Pessoa:
+    id_ = row.get("id")
+    return Pessoa(row["email"], None if id_ is None else str(id_), row.get("resumo_pessoa"), row.get("posicao"))
+
+
+class Diretorio:
+    def __init__(self, dsn: str, intervalo: float = DIRETORIO_INTERVALO):
+        self.dsn = dsn
+        self.intervalo = intervalo
+        self._pessoas: dict = {}
+        self._ausentes: set = set()   # misses confirmados no banco, até a próxima atualização
+        self._marco = None
+        self._proxima = 0.0           # time.monotonic() da próxima atualização
+        self._atualizando = threading.Lock()
+
+    def _carregar_tudo(self, conn):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            db.executar_preparado(cur, "pdi_diretorio_carga", SQL_CARGA)
+            rows = cur.fetchall()
+        self._pessoas = {r["email"]: _pessoa(r) for r in rows}
+        if rows:
+            self._marco = rows[0]["marco"]
+        else:
+            with conn.cursor() as cur:
+                cur.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+                self._marco = cur.fetchone()[0]
+
+    def _aplicar_delta(self, conn):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            db.executar_preparado(cur, "pdi_diretorio_delta", SQL_DELTA, (self._marco,))
+            row = cur.fetchone()
+        pessoas = dict(self._pessoas)
+        for r in row["alterados"]:
+            pessoas[r["email"]] = _pessoa(r)
+        if len(pessoas) != row["total"]:
+            # alguém saiu (ou mudou de e-mail): o delta não enxerga remoções
+            self._carregar_tudo(conn)
+            return
+        self._pessoas, self._marco = pessoas, row["marco"]
+
+    def atualizar(self, forcar: bool = False):
+        """Carrega (1ª vez) ou aplica o delta; se outra thread já estiver nisso, não espera."""
+        if not forcar and time.monotonic() < self._proxima:
+            return
+        if not self._atualizando.acquire(blocking=self._marco is None):
+            return
+        try:
+            if not forcar and time.monotonic() < self._proxima:
+                return
+            with db.conexao(self.dsn) as conn:
+                if self._marco is None:
+                    self._carregar_tudo(conn)
+                else:
+                    self._aplicar_delta(conn)
+            self._ausentes = set()
+            self._proxima = time.monotonic() + self.intervalo
+        finally:
+            self._atualizando.release()
+
+    def buscar(self, email: str) -> Optional[Pessoa]:
+        """Pessoa do e-mail (busca exata, como o WHERE email = ...), ou None."""
+        try:
+            self.atualizar()
+        except Exception:
+            if self._marco is None:
+                raise
+            # banco fora na atualização: segue com o diretório que já tem
+            log.warning("Falha ao atualizar o diretório de pessoas", exc_info=True)
+        pessoa = self._pessoas.get(email)
+        if pessoa is not None or email in self._ausentes:
+            return pessoa
+        with db.conexao(self.dsn) as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            db.executar_preparado(cur, "pdi_diretorio_pessoa", SQL_PESSOA, (email,))
+            row = cur.fetchone()
+        if row is None:
+            self._ausentes.add(email)
+            return None
+        pessoa = self._pessoas[email] = _pessoa(row)
+        return pessoa
+
+
+_lock = threading.Lock()
+_diretorios: dict = {}
+
+
+def get_diretorio(dsn: str) -> Diretorio:
+    diretorio = _diretorios.get(dsn)
+    if diretorio is None:
+        with _lock:
+            diretorio = _diretorios.get(dsn)
+            if diretorio is None:
+                diretorio = _diretorios[dsn] = Diretorio(dsn)
+    return diretorio
+
+
+def buscar(dsn: str, email: str) -> Optional[Pessoa]:
+    """Atalho: `diretorio.buscar(DATABASE_URL, email)`."""
+    return get_diretorio(dsn).buscar(email)
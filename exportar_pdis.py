@@ -0,0 +1,216 @@
+"""Exportação em lote dos PDIs para o RH (CSV ou Parquet).
+
+Uma linha por pessoa com a última versão de cada campo (PDI, PDI formatado,
+diagnóstico e competências) e o cargo de pessoas_ativos. A leitura é feita
+com cursor nomeado (do lado do servidor) em lotes e cada lote já vai para o
+arquivo, então a memória não cresce com o número de pessoas nem com o tamanho
+dos textos.
+
+Filtros pela data da última alteração dos campos exportados: --desde/--ate, ou
+--estado ARQUIVO para exportar só o que mudou desde a exportação anterior (o
+marco gravado é o início da exportação menos EXPORTACAO_SOBREPOSICAO minutos,
+para não perder salvamentos que ainda não tinham sido confirmados; algumas
+pessoas podem sair de novo na exportação seguinte).
+
+O id de pessoas_ativos não é exportado: ele é a senha de login do app.
+
+Uso:
+    python exportar_pdis.py --saida pdis.csv
+    python exportar_pdis.py --saida pdis.parquet --desde 2025-01-01 --ate 2025-07-01
+    python exportar_pdis.py --saida pdis_novos.csv --estado exportar_pdis.json
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+
+from psycopg2 import sql as psql
+
+import db
+from contexto import INFO_DIAGNOSTICO
+
+log = logging.getLogger("exportar_pdis")
+
+LOTE = 500  # pessoas por ida ao cursor
+EXPORTACAO_SOBREPOSICAO = float(os.getenv("EXPORTACAO_SOBREPOSICAO", "10"))  # minutos
+
+# coluna do arquivo -> informação normalizada em dados_AVD_pessoas
+CAMPOS = {
+    "output_pdi": "output_pdi",
+    "output_pdi_formatado": "output_pdi_formatado",
+    "diagnostico_pdi": INFO_DIAGNOSTICO,
+    "competencia_1": "competencia_pdi_1",
+    "competencia_2": "competencia_pdi_2",
+}
+COLUNAS = ["email", "cargo", *CAMPOS, "atualizado_em"]
+
+# última versão por (email, informação): da projeção, ou do histórico enquanto ela não existe
+SQL_ULTIMOS_PROJECAO = """
+    SELECT email, info_norm, descricao, data
+    FROM {ult}
+    WHERE info_norm = ANY(%(infos)s)
+"""
+SQL_ULTIMOS_HISTORICO = """
+    SELECT DISTINCT ON (email, trim(lower(informacao)))
+           email, trim(lower(informacao)) AS info_norm, descricao, data
+    FROM {tbl}
+    WHERE email IS NOT NULL
+      AND trim(lower(informacao)) = ANY(%(infos)s)
+    ORDER BY email, trim(lower(informacao)), data DESC NULLS LAST
+"""
+SQL_EXPORTAR = """
+    WITH u AS ({ultimos})
+    SELECT u.email, p.posicao AS cargo,
+           {campos},
+           max(u.data) AS atualizado_em
+    FROM u
+    LEFT JOIN LATERAL (
+        SELECT posicao FROM pessoas_ativos WHERE email = u.email LIMIT 1
+    ) p ON true
+    GROUP BY u.email, p.posicao
+    HAVING (%(desde)s::timestamp IS NULL OR max(u.data) >= %(desde)s::timestamp)
+       AND (%(depois_de)s::timestamp IS NULL OR max(u.data) > %(depois_de)s::timestamp)
+       AND (%(ate)s::timestamp IS NULL OR max(u.data) < %(ate)s::timestamp)
+    ORDER BY u.email
+"""
+
+
+def _consulta(conn):
+    if db.projecao_disponivel(conn):
+        ultimos, alvo = SQL_ULTIMOS_PROJECAO, db.TABELA_ULTIMOS
+    else:
+        ultimos, alvo = SQL_ULTIMOS_HISTORICO, db.TABELA_AVD
+    schema, table = db.tabela_avd(conn, alvo)
+    nome = psql.SQL("{}.{}").format(psql.Identifier(schema), psql.Identifier(table))
+    campos = psql.SQL(",\n           ").join(
+        psql.SQL("max(u.descricao) FILTER (WHERE u.info_norm = {}) AS {}").format(
+            psql.Literal(info), psql.Identifier(coluna))
+        for coluna, info in CAMPOS.items()
+    )
+    return psql.SQL(SQL_EXPORTAR).format(
+        ultimos=psql.SQL(ultimos).format(ult=nome, tbl=nome), campos=campos)
+
+
+def ler_lotes(dsn: str, desde=None, ate=None, depois_de=None, lote: int = LOTE):
+    """Gera listas de tuplas na ordem de COLUNAS, `lote` pessoas por vez."""
+    params = {"infos": list(CAMPOS.values()), "desde": desde, "ate": ate, "depois_de": depois_de}
+    with db.conexao(dsn) as conn:
+        consulta = _consulta(conn)
+        with conn.cursor(name="exportar_pdis") as cur:
+            cur.itersize = lote
+            cur.execute(consulta, params)
+            while True:
+                linhas = cur.fetchmany(lote)
+                if not linhas:
+                    break
+                yield linhas
+
+
+# ==== ESCRITORES ====
+class _EscritorCSV:
+    def __init__(self, caminho: str):
+        self._f = open(caminho, "w", encoding="utf-8-sig", newline="")  # BOM: Excel abre com acentos
+        self._w = csv.writer(self._f)
+        self._w.writerow(COLUNAS)
+
+    def escrever(self, linhas):
+        self._w.writerows(
+            [*l[:-1], l[-1].isoformat(sep=" ") if l[-1] is not None else ""] for l in linhas)
+
+    def fechar(self):
+        self._f.close()
+
+
+class _EscritorParquet:
+    def __init__(self, caminho: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Para exportar em Parquet instale o pyarrow (pip install pyarrow).")
+        self._pa = pa
+        self._schema = pa.schema(
+            [(c, pa.string()) for c in COLUNAS[:-1]] + [("atualizado_em", pa.timestamp("us"))])
+        self._w = pq.ParquetWriter(caminho, self._schema, compression="zstd")
+
+    def escrever(self, linhas):
+        colunas = list(zip(*linhas))
+        self._w.write_table(self._pa.Table.from_arrays(
+            [self._pa.array(c, type=f.type) for c, f in zip(colunas, self._schema)], schema=self._schema))
+
+    def fechar(self):
+        self._w.close()
+
+
+def exportar(dsn: str, saida: str, formato: str, desde=None, ate=None, depois_de=None) -> int:
+    """Escreve o arquivo (via temporário + rename); devolve quantas pessoas saíram."""
+    temporario = saida + ".parcial"
+    escritor = (_EscritorParquet if formato == "parquet" else _EscritorCSV)(temporario)
+    total = 0
+    try:
+        for linhas in ler_lotes(dsn, desde, ate, depois_de):
+            escritor.escrever(linhas)
+            total += len(linhas)
+            log.info("%s pessoas exportadas", total)
+    finally:
+        escritor.fechar()
+    os.replace(temporario, saida)
+    return total
+
+
+# ==== ESTADO DA EXPORTAÇÃO INCREMENTAL ====
+def ler_estado(caminho: str):
+    if caminho and os.path.exists(caminho):
+        with open(caminho, encoding="utf-8") as f:
+            valor = json.load(f).get("marco")
+        return datetime.fromisoformat(valor) if valor else None
+    return None
+
+
+def gravar_estado(caminho: str, marco: datetime):
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump({"marco": marco.isoformat(), "exportado_em": datetime.now().isoformat()}, f)
+
+
+def proximo_marco(inicio: datetime, ate=None, anterior=None) -> datetime:
+    """Início da exportação (ou --ate, se antes) menos a sobreposição; nunca volta atrás."""
+    marco = min(inicio, ate or inicio) - timedelta(minutes=EXPORTACAO_SOBREPOSICAO)
+    return max(marco, anterior) if anterior else marco
+
+
+def _data(valor: str) -> datetime:
+    return datetime.fromisoformat(valor)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta os PDIs (última versão por pessoa) em CSV ou Parquet.")
+    parser.add_argument("--saida", required=True, help="arquivo de saída (.csv ou .parquet)")
+    parser.add_argument("--formato", choices=("csv", "parquet"),
+                        help="padrão: pela extensão da saída")
+    parser.add_argument("--desde", type=_data, help="alterados a partir desta data (AAAA-MM-DD)")
+    parser.add_argument("--ate", type=_data, help="alterados antes desta data (AAAA-MM-DD)")
+    parser.add_argument("--estado",
+                        help="JSON com o marco da última exportação: exporta só o que mudou depois dele e o atualiza")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    dsn = (os.getenv("DATABASE_URL") or "").strip()
+    if not dsn:
+        sys.exit("Variável 'DATABASE_URL' não está definida.")
+    formato = args.formato or ("parquet" if args.saida.lower().endswith(".parquet") else "csv")
+    depois_de = ler_estado(args.estado)
+
+    inicio = datetime.now()  # mesmo relógio do app, que grava `data` com datetime.now()
+    total = exportar(dsn, args.saida, formato, args.desde, args.ate, depois_de)
+    print(f"{total} pessoas exportadas em {args.saida}"
+          + (f" (alteradas depois de {depois_de:%Y-%m-%d %H:%M:%S})" if depois_de else ""))
+    if args.estado:
+        gravar_estado(args.estado, proximo_marco(inicio, args.ate, depois_de))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
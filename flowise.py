@@ -0,0 +1,137 @@
+"""Cliente do endpoint de predição do Flowise (API_URL)."""
+import hashlib
+import json
+import os
+import time
+
+import admissao
+import http_cliente
+import metricas
+
+FLOWISE_STREAMING = os.getenv("FLOWISE_STREAMING", "1").strip().lower() not in ("0", "false", "nao", "não")
+
+# endpoints que já responderam sem suporte a streaming: vão direto para a chamada normal
+_sem_streaming: set = set()
+
+
+def extrair_resposta(output: dict) -> str:
+    """Texto gerado, qualquer que seja o campo usado pelo fluxo (text/answer/output/data)."""
+    return (
+        output.get("text")
+        or output.get("answer")
+        or output.get("output")
+        or (output["data"][0]["text"] if "data" in output and output["data"] else "")
+        or ""
+    )
+
+
+def _headers() -> dict:
+    headers = {"Content-Type": "application/json"}
+    # Se tiver uma API Key no Flowise, descomente a linha abaixo
+    # headers["Authorization"] = f"Bearer {FLOWISE_API_KEY}"
+    return headers
+
+
+def _chave(api_url: str, pergunta: str, session_id: str):
+    return (api_url, hashlib.sha256(pergunta.encode("utf-8")).hexdigest(), session_id)
+
+
+def gerar(api_url: str, pergunta: str, session_id: str, ao_enfileirar=None) -> str:
+    """Envia o prompt ao Flowise e devolve o texto da resposta.
+
+    Passa pelo portão de admissão (`ao_enfileirar(posicao)` enquanto espera) e
+    divide a chamada com pedidos idênticos em andamento.
+    """
+    def chamar(repassar):
+        with admissao.PORTAO.entrar(ao_enfileirar):
+            return _gerar(api_url, pergunta, session_id)
+    return admissao.voo_unico(_chave(api_url, pergunta, session_id), chamar)
+
+
+def _gerar(api_url: str, pergunta: str, session_id: str) -> str:
+    with metricas.span("flowise", "gerar", bytes_prompt=len(pergunta.encode("utf-8"))) as s:
+        r = http_cliente.post(
+            "flowise", api_url,
+            json={"question": pergunta, "overrideConfig": {"sessionId": session_id}},
+            headers=_headers(),
+        )
+        if not r.ok:
+            raise RuntimeError(f"Flowise respondeu {r.status_code}: {r.text[:500]}")
+        texto = extrair_resposta(r.json())
+        s.medir(bytes_resposta=len(texto.encode("utf-8")))
+    return texto
+
+
+def _eventos_sse(r):
+    """Payloads das linhas `data:` de uma resposta SSE do Flowise."""
+    # text/event-stream sem charset: o requests decodificaria como ISO-8859-1; SSE é sempre UTF-8
+    for bruta in r.iter_lines():
+        linha = bruta.decode("utf-8", errors="replace")
+        if not linha or not linha.startswith("data:"):
+            continue
+        bruto = linha[len("data:"):]
+        if bruto.startswith(" "):  # só o espaço opcional do SSE: os do token fazem parte do texto
+            bruto = bruto[1:]
+        try:
+            evento = json.loads(bruto)
+        except ValueError:
+            evento = None
+        # token cru que por acaso é JSON válido ("42", "true", "\"oi\"") continua sendo texto
+        yield evento if isinstance(evento, dict) else {"event": "token", "data": bruto}
+
+
+def gerar_stream(api_url: str, pergunta: str, session_id: str, ao_receber=None, ao_enfileirar=None) -> str:
+    """Como `gerar`, mas pede a saída em streaming (SSE) e chama `ao_receber(trecho)` a cada token.
+
+    Se o endpoint não fizer streaming (responde JSON ou recusa o pedido), cai na chamada normal.
+    """
+    if not FLOWISE_STREAMING or api_url in _sem_streaming:
+        return gerar(api_url, pergunta, session_id, ao_enfileirar=ao_enfileirar)
+
+    def chamar(repassar):
+        with admissao.PORTAO.entrar(ao_enfileirar), \
+                metricas.span("flowise", "gerar_stream", bytes_prompt=len(pergunta.encode("utf-8"))) as s:
+            texto = _gerar_stream(api_url, pergunta, session_id, repassar, s)
+            s.medir(bytes_resposta=len(texto.encode("utf-8")))
+        return texto
+    return admissao.voo_unico(_chave(api_url, pergunta, session_id), chamar, ao_receber)
+
+
+def _gerar_stream(api_url, pergunta, session_id, ao_receber, s) -> str:
+    r = http_cliente.post(
+        "flowise", api_url,
+        json={"question": pergunta, "streaming": True, "overrideConfig": {"sessionId": session_id}},
+        headers=_headers(),
+        stream=True,
+    )
+    with r:
+        if not r.ok:
+            if r.status_code >= 500 or r.status_code == 429:
+                # falha passageira (o http_cliente já tentou de novo): não diz nada sobre streaming
+                raise RuntimeError(f"Flowise respondeu {r.status_code}: {r.text[:500]}")
+            # o fluxo recusou o pedido com streaming: lembra e usa a chamada normal
+            _sem_streaming.add(api_url)
+            return _gerar(api_url, pergunta, session_id)
+        if "text/event-stream" not in r.headers.get("Content-Type", ""):
+            # fluxo sem streaming: a resposta já é o JSON completo
+            _sem_streaming.add(api_url)
+            return extrair_resposta(r.json())
+
+        partes, final = [], {}
+        for evento in _eventos_sse(r):
+            tipo, dado = evento.get("event"), evento.get("data")
+            if tipo == "token" and isinstance(dado, str):
+                if not partes:
+                    s.medir(segundos_ate_primeiro_token=time.perf_counter() - s.inicio)
+                partes.append(dado)
+                if ao_receber is not None:
+                    ao_receber(dado)
+            elif tipo == "error":
+                raise RuntimeError(f"Flowise retornou erro no streaming: {dado}")
+            elif tipo == "end":
+                break
+            elif isinstance(dado, dict):
+                final = dado
+
+    texto = "".join(partes)
+    return texto if texto.strip() else extrair_resposta(final)
@@ -0,0 +1,117 @@
+"""Extrator local do "PDI formatado".
+
+O prompt do PDI exige uma estrutura fixa em markdown (### Competência:,
+**Objetivo de Desenvolvimento**, **70% ...**, **20% ...**, **10% ...**). Aqui ela é
+lida diretamente e convertida no formato 'Nome do objetivo N' / 'Descrição
+objetivo N' / 'Tarefa N', sem uma segunda ida ao LLM.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List
+
+_RE_COMPETENCIA = re.compile(r"^\s*#{1,6}\s*\**\s*Compet[êe]ncia[^:]*:\s*(.+?)\s*$", re.IGNORECASE)
+_RE_SECAO = re.compile(
+    r"^\s*(?:#{1,6}\s*)?\**\s*(Objetivo de Desenvolvimento|70\s*%|20\s*%|10\s*%)", re.IGNORECASE
+)
+_RE_ITEM = re.compile(r"^(\s*)(?:[-*•]|\d+[.)])\s+(.+)$")
+_RE_SEPARADOR = re.compile(r"^\s*(?:-{3,}|\*{3,}|_{3,})\s*$")
+# título de outra seção (linha "# ..." ou inteira em negrito): encerra a lista de tarefas
+_RE_TITULO = re.compile(r"^\s*(?:#{1,6}\s+.*|\*\*[^*]+\*\*\s*:?)\s*$")
+
+
+class PDIForaDoFormato(ValueError):
+    """O texto não segue a estrutura pedida no prompt do PDI."""
+
+
+@dataclass
+class Objetivo:
+    nome: str
+    descricao: str = ""
+    tarefas: List[str] = field(default_factory=list)
+
+
+def _limpar(texto: str) -> str:
+    texto = re.sub(r"\*\*|__", "", texto)
+    return re.sub(r"\s+", " ", texto).strip(" ;:")
+
+
+def extrair_objetivos(pdi: str) -> List[Objetivo]:
+    """Competências, objetivos e tarefas (70/20/10, nessa ordem) do texto do PDI."""
+    objetivos: List[Objetivo] = []
+    atual, secao = None, None
+    descricao: List[str] = []
+    recuo_base = None
+    itens = 0              # tarefas da seção 70/20/10 atual
+    apos_branco = False    # a linha anterior estava em branco
+
+    def fechar_lista():
+        if secao == "tarefas" and not itens:
+            raise PDIForaDoFormato("Seção 70/20/10 sem nenhuma tarefa em lista.")
+
+    for linha in (pdi or "").splitlines():
+        m = _RE_COMPETENCIA.match(linha)
+        if m:
+            fechar_lista()
+            if atual is not None:
+                atual.descricao = _limpar(" ".join(descricao))
+            atual = Objetivo(nome=_limpar(m.group(1)))
+            objetivos.append(atual)
+            secao, descricao, recuo_base = None, [], None
+            continue
+        if not linha.strip():
+            apos_branco = True
+            continue
+        if atual is None or _RE_SEPARADOR.match(linha):
+            continue
+
+        m = _RE_SECAO.match(linha)
+        if m:
+            fechar_lista()
+            secao = "objetivo" if m.group(1).lower().startswith("objetivo") else "tarefas"
+            recuo_base, itens, apos_branco = None, 0, False
+            continue
+
+        if secao == "objetivo":
+            descricao.append(linha)
+        elif secao == "tarefas":
+            m = _RE_ITEM.match(linha)
+            recuo = len(m.group(1).expandtabs()) if m else None
+            recuada = len(linha) - len(linha.lstrip()) > (recuo_base or 0)
+            if m and (recuo_base is None or recuo <= recuo_base):
+                recuo_base = recuo if recuo_base is None else recuo_base
+                atual.tarefas.append(m.group(2))
+                itens += 1
+            elif _RE_TITULO.match(linha):
+                # título desconhecido (ex.: **Impacto esperado no negócio**): a lista acabou
+                fechar_lista()
+                secao = None
+            elif not itens:
+                pass  # introdução antes do primeiro item ("Atividades sugeridas:")
+            elif m or recuada or not apos_branco:
+                # sub-itens (SMART, prazos...) e continuações pertencem à tarefa anterior
+                atual.tarefas[-1] += "; " + (m.group(2) if m else linha.strip())
+            # parágrafo solto depois de uma linha em branco: fica de fora, a lista continua
+        apos_branco = False
+
+    fechar_lista()
+    if atual is not None:
+        atual.descricao = _limpar(" ".join(descricao))
+
+    for obj in objetivos:
+        obj.tarefas = [t for t in (_limpar(t) for t in obj.tarefas) if t]
+    if not objetivos or any(not o.nome or not o.descricao or not o.tarefas for o in objetivos):
+        raise PDIForaDoFormato("PDI sem a estrutura de competência/objetivo/tarefas esperada.")
+    return objetivos
+
+
+def formatar(objetivos: List[Objetivo]) -> str:
+    """Texto no mesmo formato que o prompt_formatado pedia ao LLM."""
+    blocos = []
+    for n, obj in enumerate(objetivos, start=1):
+        linhas = [
+            f"'Nome do objetivo {n}': {obj.nome};",
+            f"'Descrição objetivo {n}': {obj.descricao};",
+        ]
+        linhas += [f"'Tarefa {i}': {t};" for i, t in enumerate(obj.tarefas, start=1)]
+        blocos.append("\n".join(linhas))
+    return "\n\n".join(blocos)
@@ -0,0 +1,202 @@
+"""Envio de e-mail pelo Microsoft Graph: token em cache e outbox no Postgres.
+
+O app só grava a mensagem na tabela `outbox_emails`; um worker em segundo plano
+(um por processo, várias réplicas podem rodar juntas graças ao SKIP LOCKED)
+entrega e reagenda as falhas com backoff.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import db
+import http_cliente
+
+log = logging.getLogger(__name__)
+
+TOKEN_MARGEM = 300  # segundos antes do vencimento em que o token já é renovado
+OUTBOX_LOTE = int(os.getenv("OUTBOX_LOTE", "10"))
+OUTBOX_INTERVALO = float(os.getenv("OUTBOX_INTERVALO", "30"))       # segundos entre varreduras
+OUTBOX_MAX_TENTATIVAS = int(os.getenv("OUTBOX_MAX_TENTATIVAS", "8"))
+# trocáveis para apontar para um servidor de testes (ver bench/)
+GRAPH_LOGIN_URL = os.getenv("GRAPH_LOGIN_URL", "https://login.microsoftonline.com").rstrip("/")
+GRAPH_API_URL = os.getenv("GRAPH_API_URL", "https://graph.microsoft.com").rstrip("/")
+
+
+@dataclass(frozen=True)
+class ConfigGraph:
+    tenant_id: Optional[str]
+    client_id: Optional[str]
+    client_secret: Optional[str]
+    remetente: Optional[str]
+
+    @property
+    def completa(self) -> bool:
+        return all([self.tenant_id, self.client_id, self.client_secret, self.remetente])
+
+
+# ==== TOKEN ====
+_token_lock = threading.Lock()
+_tokens: dict = {}  # (tenant, client_id) -> (token, expira_em)
+
+
+def obter_token(cfg: ConfigGraph, forcar: bool = False) -> str:
+    """Token client-credentials do Azure AD, reaproveitado até perto de vencer."""
+    chave = (cfg.tenant_id, cfg.client_id)
+    with _token_lock:
+        token, expira_em = _tokens.get(chave, (None, 0.0))
+        if token and not forcar and time.time() < expira_em - TOKEN_MARGEM:
+            return token
+        url = f"{GRAPH_LOGIN_URL}/{cfg.tenant_id}/oauth2/v2.0/token"
+        data = {
+            "client_id": cfg.client_id,
+            "client_secret": cfg.client_secret,
+            "scope": "https://graph.microsoft.com/.default",
+            "grant_type": "client_credentials"
+        }
+        resp = http_cliente.post("graph_token", url, data=data)
+        resp.raise_for_status()
+        corpo = resp.json()
+        token = corpo["access_token"]
+        _tokens[chave] = (token, time.time() + float(corpo.get("expires_in", 3600)))
+        return token
+
+
+def enviar_email(cfg: ConfigGraph, destinatario: str, assunto: str, corpo: str):
+    """Envia um e-mail pelo Microsoft Graph; levanta RuntimeError se o Graph recusar."""
+    url = f"{GRAPH_API_URL}/v1.0/users/{cfg.remetente}/sendMail"
+    message = {
+        "message": {
+            "subject": assunto,
+            "body": {
+                "contentType": "Text",
+                "content": corpo
+            },
+            "toRecipients": [
+                {"emailAddress": {"address": destinatario}}
+            ]
+        }
+    }
+    for forcar in (False, True):
+        headers = {
+            "Authorization": f"Bearer {obter_token(cfg, forcar=forcar)}",
+            "Content-Type": "application/json"
+        }
+        resp = http_cliente.post("graph", url, headers=headers, json=message)
+        if resp.status_code != 401:
+            break
+        # token revogado/expirado antes da hora: renova uma vez
+    if resp.status_code not in (200, 202):
+        raise RuntimeError(f"Graph respondeu {resp.status_code}: {resp.text[:500]}")
+
+
+# ==== OUTBOX ====
+SQL_CRIAR_OUTBOX = """
+    CREATE TABLE IF NOT EXISTS outbox_emails (
+        id                bigserial PRIMARY KEY,
+        destinatario      text NOT NULL,
+        assunto           text NOT NULL,
+        corpo             text NOT NULL,
+        status            text NOT NULL DEFAULT 'pendente',
+        tentativas        integer NOT NULL DEFAULT 0,
+        proxima_tentativa timestamptz NOT NULL DEFAULT now(),
+        ultimo_erro       text,
+        criado_em         timestamptz NOT NULL DEFAULT now(),
+        enviado_em        timestamptz
+    );
+    CREATE INDEX IF NOT EXISTS outbox_emails_pendentes_idx
+        ON outbox_emails (proxima_tentativa) WHERE status = 'pendente';
+"""
+SQL_ENFILEIRAR = """
+    INSERT INTO outbox_emails (destinatario, assunto, corpo)
+    VALUES ($1, $2, $3)
+"""
+# reserva um lote: a reserva expira sozinha se o processo morrer no meio do envio
+SQL_RESERVAR = """
+    UPDATE outbox_emails
+       SET proxima_tentativa = now() + interval '5 minutes',
+           tentativas = tentativas + 1
+     WHERE id IN (
+        SELECT id FROM outbox_emails
+         WHERE status = 'pendente' AND proxima_tentativa <= now()
+         ORDER BY id
+         LIMIT $1
+         FOR UPDATE SKIP LOCKED
+     )
+    RETURNING id, destinatario, assunto, corpo, tentativas
+"""
+SQL_ENVIADO = """
+    UPDATE outbox_emails SET status = 'enviado', enviado_em = now(), ultimo_erro = NULL
+     WHERE id = $1
+"""
+SQL_FALHOU = """
+    UPDATE outbox_emails
+       SET ultimo_erro = $2,
+           proxima_tentativa = now() + make_interval(secs => $3),
+           status = CASE WHEN tentativas >= $4 THEN 'falhou' ELSE 'pendente' END
+     WHERE id = $1
+"""
+
+_acordar = threading.Event()
+_worker_lock = threading.Lock()
+_worker: Optional[threading.Thread] = None
+
+
+def enfileirar_email(dsn: str, destinatario: str, assunto: str, corpo: str):
+    """Grava o e-mail na outbox; a entrega fica com o worker."""
+    with db.conexao(dsn) as conn:
+        db.garantir_ddl(conn, SQL_CRIAR_OUTBOX)
+        with conn.cursor() as cur:
+            db.executar_preparado(cur, "pdi_outbox_enfileirar", SQL_ENFILEIRAR,
+                                  (destinatario, assunto, corpo))
+    _acordar.set()
+
+
+def processar_outbox(dsn: str, cfg: ConfigGraph) -> int:
+    """Entrega um lote de e-mails pendentes; devolve quantos foram enviados."""
+    with db.conexao(dsn) as conn:
+        db.garantir_ddl(conn, SQL_CRIAR_OUTBOX)
+        with conn.cursor() as cur:
+            db.executar_preparado(cur, "pdi_outbox_reservar", SQL_RESERVAR, (OUTBOX_LOTE,))
+            lote = cur.fetchall()
+
+    enviados = 0
+    for id_, destinatario, assunto, corpo, tentativas in lote:
+        try:
+            enviar_email(cfg, destinatario, assunto, corpo)
+        except Exception as e:
+            espera = min(60 * 2 ** (tentativas - 1), 6 * 3600)
+            with db.conexao(dsn) as conn, conn.cursor() as cur:
+                db.executar_preparado(cur, "pdi_outbox_falhou", SQL_FALHOU,
+                                      (id_, str(e)[:1000], espera, OUTBOX_MAX_TENTATIVAS))
+            log.warning("Falha ao enviar e-mail %s (tentativa %s): %s", id_, tentativas, e)
+            continue
+        with db.conexao(dsn) as conn, conn.cursor() as cur:
+            db.executar_preparado(cur, "pdi_outbox_enviado", SQL_ENVIADO, (id_,))
+        enviados += 1
+    return enviados
+
+
+def _loop_worker(dsn: str, cfg: ConfigGraph):
+    while True:
+        _acordar.clear()
+        try:
+            if processar_outbox(dsn, cfg) >= OUTBOX_LOTE:
+                continue  # ainda pode haver fila: não espera
+        except Exception:
+            log.exception("Erro no worker da outbox de e-mails")
+        _acordar.wait(OUTBOX_INTERVALO)
+
+
+def iniciar_worker(dsn: str, cfg: ConfigGraph):
+    """Sobe o worker da outbox uma vez por processo (sem credenciais do Graph, não sobe)."""
+    global _worker
+    if not cfg.completa or (_worker is not None and _worker.is_alive()):
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_loop_worker, args=(dsn, cfg),
+                                       name="outbox-emails", daemon=True)
+            _worker.start()
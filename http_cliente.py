@@ -0,0 +1,88 @@
+"""Cliente HTTP compartilhado pelo processo (Flowise e Microsoft Graph).
+
+Uma única `requests.Session` com pool de conexões keep-alive; cada destino tem
+seus timeouts de conexão/leitura e uma política de retentativas com backoff
+exponencial e jitter para 429/5xx.
+"""
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metricas
+
+HTTP_POOL_MAX = int(os.getenv("HTTP_POOL_MAX", "20"))
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+@dataclass(frozen=True)
+class Politica:
+    conexao: float = 5.0       # segundos para abrir a conexão
+    leitura: float = 30.0      # segundos sem receber bytes
+    tentativas: int = 3
+    backoff: float = 0.5       # base do backoff exponencial
+    backoff_max: float = 8.0
+    retry_leitura: bool = True  # repetir depois de timeout de leitura?
+
+
+POLITICAS = {
+    # geração longa: timeout de leitura não é repetido (o Flowise pode ainda estar processando)
+    "flowise": Politica(leitura=float(os.getenv("FLOWISE_TIMEOUT", "150")), tentativas=2, retry_leitura=False),
+    "graph_token": Politica(leitura=15.0),
+    "graph": Politica(leitura=30.0),
+}
+
+_lock = threading.Lock()
+_sessao = None
+
+
+def sessao() -> requests.Session:
+    global _sessao
+    if _sessao is None:
+        with _lock:
+            if _sessao is None:
+                s = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=len(POLITICAS), pool_maxsize=HTTP_POOL_MAX)
+                s.mount("https://", adaptador)
+                s.mount("http://", adaptador)
+                _sessao = s
+    return _sessao
+
+
+def _espera(pol: Politica, tentativa: int, resp=None) -> float:
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), pol.backoff_max)
+    # full jitter
+    return random.uniform(0, min(pol.backoff_max, pol.backoff * 2 ** (tentativa - 1)))
+
+
+def post(destino: str, url: str, **kwargs) -> requests.Response:
+    """POST pela sessão compartilhada com a política do destino ("flowise", "graph_token", "graph")."""
+    pol = POLITICAS[destino]
+    kwargs.setdefault("timeout", (pol.conexao, pol.leitura))
+    with metricas.span("http", destino) as s:
+        for tentativa in range(1, pol.tentativas + 1):
+            s.medir(tentativas=tentativa)
+            try:
+                r = sessao().post(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                repetir = pol.retry_leitura or not isinstance(e, requests.ReadTimeout)
+                if not repetir or tentativa == pol.tentativas:
+                    raise
+                time.sleep(_espera(pol, tentativa))
+                continue
+            if r.status_code not in RETRY_STATUS or tentativa == pol.tentativas:
+                s.status = str(r.status_code)
+                s.medir(bytes_enviados=len(r.request.body or b""),
+                        bytes_recebidos=int(r.headers.get("Content-Length") or 0))
+                return r
+            espera = _espera(pol, tentativa, r)
+            r.close()
+            time.sleep(espera)
+    raise AssertionError("inalcançável")
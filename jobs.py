@@ -0,0 +1,101 @@
+"""Execução em segundo plano das gerações com IA (diagnóstico, PDI).
+
+O executor é criado uma vez por processo; cada job fica registrado pela sua
+chave (tipo + sessionId) e o resultado continua disponível depois de reruns ou
+de um refresh da página, até expirar.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+import admissao
+
+# o limite de chamadas simultâneas ao Flowise é do portão (admissao.py); aqui só precisa
+# caber quem está gerando, quem está na fila e os jobs resolvidos pelo cache
+GERACAO_WORKERS = int(os.getenv(
+    "GERACAO_WORKERS", str(admissao.GERACAO_CONCORRENCIA + admissao.GERACAO_FILA_MAX + 8)
+))
+GERACAO_RETENCAO = float(os.getenv("GERACAO_RETENCAO", "7200"))  # segundos que um job concluído fica guardado
+
+PENDENTE, RODANDO, CONCLUIDO, ERRO = "pendente", "rodando", "concluido", "erro"
+
+
+@dataclass
+class Job:
+    chave: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = PENDENTE
+    resultado: Optional[str] = None
+    parcial: str = ""  # texto recebido até agora, para geração em streaming
+    posicao_fila: int = 0  # posição na fila do portão de gerações (0 = não está esperando)
+    erro: Optional[str] = None
+    criado_em: float = field(default_factory=time.time)
+    concluido_em: Optional[float] = None
+
+    @property
+    def em_andamento(self) -> bool:
+        return self.status in (PENDENTE, RODANDO)
+
+    def acrescentar(self, trecho: str):
+        self.parcial += trecho
+
+    def enfileirado(self, posicao: int):
+        self.posicao_fila = posicao
+
+    @property
+    def decorrido(self) -> float:
+        return (self.concluido_em or time.time()) - self.criado_em
+
+
+_executor = ThreadPoolExecutor(max_workers=GERACAO_WORKERS, thread_name_prefix="geracao")
+_lock = threading.Lock()
+_jobs: dict = {}
+
+
+def chave_job(tipo: str, session_id: str) -> str:
+    return f"{tipo}:{session_id}"
+
+
+def _rodar(job: Job, fn, args, kwargs):
+    job.status = RODANDO
+    try:
+        job.resultado = fn(*args, **kwargs)
+        status = CONCLUIDO
+    except Exception as e:
+        job.erro = str(e)
+        status = ERRO
+    job.concluido_em = time.time()
+    job.status = status
+
+
+def _limpar():
+    limite = time.time() - GERACAO_RETENCAO
+    for chave in [c for c, j in _jobs.items() if j.concluido_em and j.concluido_em < limite]:
+        del _jobs[chave]
+
+
+def submeter(chave: str, fn, *args, parcial: bool = False, **kwargs) -> Job:
+    """Agenda `fn(*args, **kwargs)`; se já houver job em andamento com a mesma chave, devolve ele.
+
+    Com `parcial=True`, `fn` recebe `ao_receber` para ir publicando o texto em `job.parcial`
+    e `ao_enfileirar` para publicar a posição na fila em `job.posicao_fila`.
+    """
+    with _lock:
+        _limpar()
+        job = _jobs.get(chave)
+        if job is not None and job.em_andamento:
+            return job
+        job = _jobs[chave] = Job(chave)
+    if parcial:
+        kwargs["ao_receber"] = job.acrescentar
+        kwargs["ao_enfileirar"] = job.enfileirado
+    _executor.submit(_rodar, job, fn, args, kwargs)
+    return job
+
+
+def obter(chave: str) -> Optional[Job]:
+    return _jobs.get(chave)
@@ -0,0 +1,178 @@
+"""Instrumentação leve do caminho quente: spans, histogramas e formato Prometheus.
+
+Cada consulta ao banco, chamada HTTP e montagem de prompt abre um `span` com
+duração, status (ok/erro) e medidas (linhas, bytes, tokens). Os spans vão
+para histogramas do processo e, se a thread estiver num rerun, para a linha do
+tempo desse rerun (mostrada no painel de debug dos admins).
+
+Com METRICAS_PORTA definida, o processo serve /metrics no formato texto do
+Prometheus nessa porta.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+log = logging.getLogger(__name__)
+
+METRICAS_PORTA = os.getenv("METRICAS_PORTA")
+# limites dos buckets em segundos: do SELECT por chave primária à geração de 150s
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 150)
+LINHA_DO_TEMPO_MAX = 500  # spans guardados por rerun
+
+
+@dataclass
+class Span:
+    tipo: str                # db, http, flowise, prompt, rerun
+    nome: str
+    inicio: float = field(default_factory=time.perf_counter)
+    duracao: float = 0.0
+    status: str = "ok"
+    erro: Optional[str] = None
+    medidas: dict = field(default_factory=dict)  # linhas, bytes_enviados, tokens...
+
+    def medir(self, **medidas):
+        self.medidas.update({k: v for k, v in medidas.items() if v is not None})
+
+
+class _Histograma:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.soma = 0.0
+        self.contagem = 0
+
+    def observar(self, valor: float):
+        self.soma += valor
+        self.contagem += 1
+        for i, limite in enumerate(BUCKETS):
+            if valor <= limite:
+                self.buckets[i] += 1
+
+
+_lock = threading.Lock()
+_histogramas: dict = {}   # (tipo, nome, status) -> _Histograma
+_medidas: dict = {}       # (tipo, nome, medida) -> soma
+_local = threading.local()
+
+
+# ==== LINHA DO TEMPO DO RERUN ====
+def iniciar_rerun():
+    """Começa uma linha do tempo nova para a thread atual (o script do Streamlit)."""
+    _local.inicio = time.perf_counter()
+    _local.spans = []
+
+
+def fechar_rerun(nome: str = "pagina"):
+    """Registra a duração do rerun inteiro (do iniciar_rerun até aqui)."""
+    inicio = inicio_rerun()
+    if inicio is not None:
+        registrar(Span("rerun", nome, inicio=inicio, duracao=time.perf_counter() - inicio))
+
+
+def linha_do_tempo() -> List[Span]:
+    return list(getattr(_local, "spans", None) or [])
+
+
+def inicio_rerun() -> Optional[float]:
+    return getattr(_local, "inicio", None)
+
+
+# ==== SPANS ====
+def registrar(s: Span):
+    with _lock:
+        hist = _histogramas.get((s.tipo, s.nome, s.status))
+        if hist is None:
+            hist = _histogramas[(s.tipo, s.nome, s.status)] = _Histograma()
+        hist.observar(s.duracao)
+        for medida, valor in s.medidas.items():
+            if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                chave = (s.tipo, s.nome, medida)
+                _medidas[chave] = _medidas.get(chave, 0) + valor
+    spans = getattr(_local, "spans", None)
+    if spans is not None and len(spans) < LINHA_DO_TEMPO_MAX:
+        spans.append(s)
+
+
+@contextmanager
+def span(tipo: str, nome: str, **medidas):
+    """`with metricas.span("db", "pdi_contexto") as s: ...; s.medir(linhas=n)`"""
+    s = Span(tipo, nome, medidas={k: v for k, v in medidas.items() if v is not None})
+    try:
+        yield s
+    except BaseException as e:
+        s.status, s.erro = "erro", f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        s.duracao = time.perf_counter() - s.inicio
+        registrar(s)
+
+
+# ==== EXPORTAÇÃO ====
+def _rotulos(**rotulos) -> str:
+    def escapar(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in rotulos.items()) + "}"
+
+
+def exportar_prometheus() -> str:
+    """Histogramas e somas do processo no formato texto do Prometheus."""
+    with _lock:
+        histogramas = {k: (list(h.buckets), h.soma, h.contagem) for k, h in _histogramas.items()}
+        medidas = dict(_medidas)
+    linhas = [
+        "# HELP pdi_span_segundos Duração das operações instrumentadas (banco, HTTP, prompts, reruns).",
+        "# TYPE pdi_span_segundos histogram",
+    ]
+    for (tipo, nome, status), (buckets, soma, contagem) in sorted(histogramas.items()):
+        for limite, n in zip(BUCKETS, buckets):
+            linhas.append(f"pdi_span_segundos_bucket{_rotulos(tipo=tipo, nome=nome, status=status, le=limite)} {n}")
+        linhas.append(f"pdi_span_segundos_bucket{_rotulos(tipo=tipo, nome=nome, status=status, le='+Inf')} {contagem}")
+        linhas.append(f"pdi_span_segundos_sum{_rotulos(tipo=tipo, nome=nome, status=status)} {soma:.6f}")
+        linhas.append(f"pdi_span_segundos_count{_rotulos(tipo=tipo, nome=nome, status=status)} {contagem}")
+    linhas += [
+        "# HELP pdi_span_medida_total Soma das medidas dos spans (linhas, bytes, tokens).",
+        "# TYPE pdi_span_medida_total counter",
+    ]
+    for (tipo, nome, medida), valor in sorted(medidas.items()):
+        linhas.append(f"pdi_span_medida_total{_rotulos(tipo=tipo, nome=nome, medida=medida)} {valor}")
+    return "\n".join(linhas) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = exportar_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+_servidor_lock = threading.Lock()
+_servidor = None  # ThreadingHTTPServer; False se a porta não abriu
+
+
+def iniciar_servidor(porta=METRICAS_PORTA):
+    """Sobe o /metrics uma vez por processo (sem METRICAS_PORTA, não sobe)."""
+    global _servidor
+    if not porta or _servidor is not None:
+        return
+    with _servidor_lock:
+        if _servidor is None:
+            try:
+                _servidor = ThreadingHTTPServer(("0.0.0.0", int(porta)), _Handler)
+            except OSError:
+                log.warning("Não foi possível abrir a porta %s para /metrics", porta, exc_info=True)
+                _servidor = False
+                return
+            threading.Thread(target=_servidor.serve_forever, name="metricas", daemon=True).start()
@@ -0,0 +1,74 @@
+"""Aplica as migrações de migrations/ que ainda não rodaram neste banco.
+
+Cada arquivo .sql roda numa transação, em ordem de nome, e fica registrado em
+`schema_migrations`. Os marcadores {schema}, {tbl} e {ult} são trocados pelo
+schema e pelos nomes reais de dados_AVD_pessoas e da projeção dados_avd_ultimos.
+
+Uso:
+    python migrar.py            # aplica as pendentes
+    python migrar.py --listar   # só mostra o estado
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from psycopg2 import sql as psql
+
+import db
+
+PASTA = Path(__file__).resolve().parent / "migrations"
+
+SQL_CRIAR_CONTROLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        nome       text PRIMARY KEY,
+        aplicada_em timestamptz NOT NULL DEFAULT now()
+    );
+"""
+
+
+def _marcadores(conn) -> dict:
+    schema, table = db.tabela_avd(conn)
+    return {
+        "schema": psql.Identifier(schema),
+        "tbl": psql.SQL("{}.{}").format(psql.Identifier(schema), psql.Identifier(table)),
+        "ult": psql.SQL("{}.{}").format(psql.Identifier(schema), psql.Identifier(db.TABELA_ULTIMOS)),
+    }
+
+
+def aplicadas(conn) -> set:
+    with conn.cursor() as cur:
+        cur.execute(SQL_CRIAR_CONTROLE)
+        cur.execute("SELECT nome FROM schema_migrations;")
+        return {r[0] for r in cur.fetchall()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aplica as migrações pendentes.")
+    parser.add_argument("--listar", action="store_true", help="só lista o estado das migrações")
+    args = parser.parse_args(argv)
+
+    dsn = (os.getenv("DATABASE_URL") or "").strip()
+    if not dsn:
+        sys.exit("Variável 'DATABASE_URL' não está definida.")
+
+    arquivos = sorted(PASTA.glob("*.sql"))
+    with db.conexao(dsn) as conn:
+        feitas = aplicadas(conn)
+    for arquivo in arquivos:
+        if arquivo.name in feitas:
+            print(f"[ok]       {arquivo.name}")
+            continue
+        if args.listar:
+            print(f"[pendente] {arquivo.name}")
+            continue
+        print(f"[aplicando] {arquivo.name}...", flush=True)
+        with db.conexao(dsn) as conn, conn.cursor() as cur:
+            cur.execute(psql.SQL(arquivo.read_text(encoding="utf-8")).format(**_marcadores(conn)))
+            cur.execute("INSERT INTO schema_migrations (nome) VALUES (%s);", (arquivo.name,))
+        print(f"[ok]       {arquivo.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
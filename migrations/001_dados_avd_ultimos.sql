@@ -0,0 +1,36 @@
+-- Projeção "último valor por (email, informação normalizada)" de dados_AVD_pessoas.
+-- O app passa a ler daqui (busca pela chave primária) e mantém a projeção com
+-- upsert a cada salvamento; o histórico continua sendo gravado na tabela original.
+--
+-- Marcadores: {schema} = schema de dados_AVD_pessoas, {tbl} = a própria tabela,
+-- {ult} = a projeção. Aplicar com: python migrar.py
+
+-- gravações concorrentes esperam a migração: as que já estavam em andamento entram
+-- no backfill, as seguintes já encontram a projeção criada e fazem o upsert
+LOCK TABLE {tbl} IN SHARE MODE;
+
+CREATE TABLE IF NOT EXISTS {ult} (
+    email      text      NOT NULL,
+    info_norm  text      NOT NULL,
+    informacao text,
+    descricao  text,
+    data       timestamp,
+    PRIMARY KEY (email, info_norm)
+);
+
+-- índice de expressão equivalente ao DISTINCT ON antigo (backfill e consultas ao histórico)
+CREATE INDEX IF NOT EXISTS dados_avd_pessoas_email_info_norm_data_idx
+    ON {tbl} (email, (trim(lower(informacao))), data DESC NULLS LAST);
+
+-- backfill único a partir do histórico
+INSERT INTO {ult} AS u (email, info_norm, informacao, descricao, data)
+SELECT DISTINCT ON (email, trim(lower(informacao)))
+       email, trim(lower(informacao)), informacao, descricao, data
+FROM {tbl}
+WHERE email IS NOT NULL AND informacao IS NOT NULL
+ORDER BY email, trim(lower(informacao)), data DESC NULLS LAST
+ON CONFLICT (email, info_norm) DO UPDATE
+   SET informacao = EXCLUDED.informacao,
+       descricao  = EXCLUDED.descricao,
+       data       = EXCLUDED.data
+ WHERE u.data IS NULL OR EXCLUDED.data >= u.data;
@@ -0,0 +1,208 @@
+"""Montagem dos prompts de diagnóstico e PDI com orçamento de tokens.
+
+Cada bloco de contexto entra uma única vez, em uma seção com título, e as
+instruções se referem a ele pelo nome. Os textos são compactados (espaços e
+linhas repetidas) e, se o prompt passar do orçamento, os resumos semanais mais
+antigos são resumidos e depois descartados, preservando as semanas recentes.
+"""
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import metricas
+
+log = logging.getLogger(__name__)
+
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "12000"))
+RESUMOS_SEMANAS_INTEGRAIS = int(os.getenv("RESUMOS_SEMANAS_INTEGRAIS", "4"))
+RESUMO_ANTIGO_MAX_CHARS = 240
+CHARS_POR_TOKEN = 3.5  # média para texto em português
+MARCADOR_CORTE = " […]"  # no fim de um bloco encurtado
+
+
+@dataclass
+class PromptMontado:
+    texto: str
+    tokens: int
+    tokens_originais: int
+    cortes: List[str] = field(default_factory=list)
+
+
+def estimar_tokens(texto: str) -> int:
+    return int(len(texto) / CHARS_POR_TOKEN) + 1
+
+
+def compactar(texto: Optional[str]) -> str:
+    """Tira espaços sobrando e linhas repetidas, mantendo a ordem."""
+    vistas, linhas = set(), []
+    for linha in str(texto or "").splitlines():
+        linha = re.sub(r"[ \t]+", " ", linha).strip()
+        if not linha:
+            continue
+        chave = linha.lower()
+        if chave in vistas:
+            continue
+        vistas.add(chave)
+        linhas.append(linha)
+    return "\n".join(linhas)
+
+
+def _resumir(texto: str, limite: int = RESUMO_ANTIGO_MAX_CHARS) -> str:
+    texto = re.sub(r"\s+", " ", texto).strip()
+    primeira = re.split(r"(?<=[.!?])\s", texto, maxsplit=1)[0]
+    if len(primeira) > limite:
+        primeira = primeira[:limite].rsplit(" ", 1)[0] + "…"
+    return primeira
+
+
+def _linhas_resumos(resumos: Sequence[Tuple], integrais: int, resumir: bool,
+                    antigos_mantidos: Optional[int]) -> Tuple[List[str], int]:
+    """Linhas dos resumos e quantas semanas antigas entraram.
+
+    As `integrais` semanas recentes vão sempre na íntegra; com `resumir`, as antigas
+    viram a primeira frase e só entram as `antigos_mantidos` mais novas (se informado).
+    """
+    vistos, unicos = set(), []
+    for ts, sm in resumos:
+        sm = compactar(sm).replace("\n", " ")
+        if sm and sm.lower() not in vistos:
+            vistos.add(sm.lower())
+            unicos.append((ts, sm))
+    corte = max(len(unicos) - integrais, 0)
+    antigos, recentes = unicos[:corte], unicos[corte:]
+    if not resumir:
+        return [f"semana {ts.strftime('%d/%m/%Y')} - {sm}" for ts, sm in unicos], len(antigos)
+    if antigos_mantidos is not None:
+        antigos = antigos[len(antigos) - antigos_mantidos:] if antigos_mantidos else []
+    linhas = [f"semana {ts.strftime('%d/%m/%Y')} (resumido) - {_resumir(sm)}" for ts, sm in antigos]
+    linhas += [f"semana {ts.strftime('%d/%m/%Y')} - {sm}" for ts, sm in recentes]
+    return linhas, len(antigos)
+
+
+def _renderizar(abertura: str, blocos: List[Tuple[str, str]], instrucoes: str) -> str:
+    secoes = [f"## {titulo}\n{texto or '(não informado)'}" for titulo, texto in blocos]
+    return "\n\n".join([abertura.strip(), *secoes, instrucoes.strip()])
+
+
+def _montar(abertura: str, blocos: List[Tuple[str, str]], resumos: Sequence[Tuple],
+            instrucoes: str, cortaveis: Sequence[str], orcamento: int, rotulo: str) -> PromptMontado:
+    with metricas.span("prompt", rotulo) as s:
+        montado = _ajustar(abertura, blocos, resumos, instrucoes, cortaveis, orcamento, rotulo)
+        s.medir(tokens=montado.tokens, tokens_originais=montado.tokens_originais,
+                bytes=len(montado.texto.encode("utf-8")))
+    return montado
+
+
+def _ajustar(abertura: str, blocos: List[Tuple[str, str]], resumos: Sequence[Tuple],
+             instrucoes: str, cortaveis: Sequence[str], orcamento: int, rotulo: str) -> PromptMontado:
+    blocos = [(t, compactar(x)) for t, x in blocos]
+    titulo_resumos = "RELATÓRIOS SEMANAIS"
+    original = _renderizar(abertura, blocos + [(titulo_resumos, "\n".join(
+        f"semana {ts.strftime('%d/%m/%Y')} - {sm}" for ts, sm in resumos))], instrucoes)
+
+    cortes: List[str] = []
+    resumir, antigos = False, None
+    while True:
+        linhas, n_antigos = _linhas_resumos(resumos, RESUMOS_SEMANAS_INTEGRAIS, resumir, antigos)
+        texto = _renderizar(abertura, blocos + [(titulo_resumos, "\n".join(linhas))], instrucoes)
+        excesso = estimar_tokens(texto) - orcamento
+        if excesso <= 0:
+            break
+        if n_antigos and not resumir:
+            # primeiro passo acima do orçamento: semanas antigas só com a primeira frase
+            resumir = True
+            cortes.append("semanas antigas resumidas")
+            continue
+        if n_antigos:
+            # descarta as semanas antigas (já resumidas), da mais velha para a mais nova
+            antigos = n_antigos - 1
+            cortes.append("semana antiga descartada")
+            continue
+        # ainda acima: encurta o maior bloco cortável
+        maiores = sorted(((len(x), i) for i, (t, x) in enumerate(blocos) if t in cortaveis), reverse=True)
+        if not maiores or maiores[0][0] < 400:
+            break
+        tam, i = maiores[0]
+        novo = max(200, tam - int(excesso * CHARS_POR_TOKEN) - 1)
+        # o marcador conta no tamanho: cada passada encurta o bloco (texto sem espaço, como
+        # uma URL colada, é cortado no meio)
+        cortado = blocos[i][1][:novo - len(MARCADOR_CORTE)]
+        if " " in cortado:
+            cortado = cortado.rsplit(" ", 1)[0]
+        blocos[i] = (blocos[i][0], cortado + MARCADOR_CORTE)
+        cortes.append(f"{blocos[i][0]} encurtado")
+
+    montado = PromptMontado(texto, estimar_tokens(texto), estimar_tokens(original), cortes)
+    log.info("prompt %s: ~%s tokens (antes ~%s, orçamento %s)%s", rotulo, montado.tokens,
+             montado.tokens_originais, orcamento, f" cortes: {sorted(set(cortes))}" if cortes else "")
+    return montado
+
+
+def prompt_diagnostico(*, resumo_pessoa, feedback, pontos_fortes, pontos_desenvolvimento,
+                       tarefas, objetivos, historico_bot, resumos,
+                       orcamento: int = PROMPT_MAX_TOKENS) -> PromptMontado:
+    abertura = """
+Nesse momento, você como especialista deverá fazer um diagnóstico que ajude a pessoa a tomar a decisão do que pode fazer mais sentido se desenvolver.
+As informações da pessoa estão nas seções abaixo.
+"""
+    blocos = [
+        ("SOBRE A PESSOA", resumo_pessoa),
+        ("FEEDBACK (caso a pessoa tenha)", feedback),
+        ("PONTOS FORTES", pontos_fortes),
+        ("PONTOS DE DESENVOLVIMENTO", pontos_desenvolvimento),
+        ("TAREFAS ATUAIS E COMO ELAS SÃO", tarefas),
+        ("OBJETIVOS DE CARREIRA", objetivos),
+        ("HISTÓRICO DE INTERAÇÃO COM VOCÊ", historico_bot),
+    ]
+    instrucoes = """
+Leve em consideração também os RELATÓRIOS SEMANAIS para mapear as tarefas e dificuldades.
+Retorne esse diagnóstico com a seguinte estrutura e oferecendo argumentos e os motivos.
+1- Resumo da pessoa até o momento:
+2- Gaps na posição atual e direcional para a posição atual:
+3- Futuro dado posição atual e objetivos de carreira:
+4- Indicações de pontos de desenvolvimento:(Citando competências, habilidades e atitudes que dado as informações a pessoa deveria considerar desenvolver, bem como os motivos. Foque apenas em sugestões sem montar um PDI ou usar o 70 20 10. é apenas recomendação.)
+"""
+    return _montar(abertura, blocos, resumos, instrucoes,
+                   cortaveis=("HISTÓRICO DE INTERAÇÃO COM VOCÊ", "SOBRE A PESSOA", "FEEDBACK (caso a pessoa tenha)"),
+                   orcamento=orcamento, rotulo="diagnóstico")
+
+
+def prompt_pdi(*, diagnostico, tarefas, resumos, focos, orcamento: int = PROMPT_MAX_TOKENS) -> PromptMontado:
+    abertura = """
+Você é um especialista em desenvolvimento de carreira e deverá criar um Plano de Desenvolvimento Individual (PDI) de alta qualidade.
+Use o DIAGNÓSTICO INICIAL abaixo como base para montar o PDI e as TAREFAS DA PESSOA e os RELATÓRIOS SEMANAIS para sugerir atividades práticas que façam sentido no contexto do dia a dia da pessoa.
+"""
+    blocos = [
+        ("DIAGNÓSTICO INICIAL", diagnostico),
+        ("PONTOS DE DESENVOLVIMENTO ESCOLHIDOS PELA PESSOA", "\n".join(focos)),
+        ("TAREFAS DA PESSOA", tarefas),
+    ]
+    instrucoes = """
+Estruture o PDI no modelo 70-20-10, separado por competência, para os PONTOS DE DESENVOLVIMENTO ESCOLHIDOS PELA PESSOA.
+Para cada competência, siga esta estrutura:
+
+### Competência: [nome da competência]
+
+**Objetivo de Desenvolvimento**
+Descreva o objetivo principal para esta competência, resumido em 2-3 linhas.
+
+**70% Atividades práticas (on the job)**
+Liste de 3 a 5 atividades diretamente conectadas às TAREFAS DA PESSOA e aos RELATÓRIOS SEMANAIS.
+Cada atividade deve ser descrita no formato SMART.
+
+**20% Aprendizagem com os outros**
+Liste de 2 a 4 atividades informais (mentorias, feedbacks, shadowing etc.), conectadas às TAREFAS DA PESSOA e aos RELATÓRIOS SEMANAIS, no formato SMART.
+
+**10% Cursos e treinamentos**
+Indique de 1 a 3 formações formais relacionadas à competência.
+
+--- Regras ---
+- O PDI deve ter múltiplas competências, cada uma com sua própria estrutura.
+- Nas seções 70% e 20%, use as TAREFAS DA PESSOA e os RELATÓRIOS SEMANAIS para alinhar à realidade.
+- Todas as metas devem estar no formato SMART.
+- Conecte os objetivos de desenvolvimento ao impacto esperado no negócio.
+"""
+    return _montar(abertura, blocos, resumos, instrucoes,
+                   cortaveis=("TAREFAS DA PESSOA",), orcamento=orcamento, rotulo="PDI")
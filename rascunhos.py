@@ -0,0 +1,120 @@
+"""Rascunho do PDI no Postgres: o estado em andamento de cada pessoa por ciclo.
+
+Diagnóstico gerado/salvo, competências e PDI ainda não salvo não ficam só no
+st.session_state de um processo: cada sessão grava o que mudou em
+`rascunhos_pdi` (chave email + ciclo) e uma sessão nova, em qualquer réplica ou
+depois de um deploy, começa do rascunho. A gravação é otimista: leva a versão
+lida e só passa se ninguém gravou no meio (senão, ConflitoVersao).
+"""
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Optional
+
+import db
+
+log = logging.getLogger(__name__)
+
+PDI_CICLO = os.getenv("PDI_CICLO")  # ex.: "2025-2"; sem ela, o semestre corrente
+RASCUNHO_RECHECAR = float(os.getenv("RASCUNHO_RECHECAR", "30"))  # segundos entre leituras do rascunho na sessão
+
+SQL_CRIAR = """
+    CREATE TABLE IF NOT EXISTS rascunhos_pdi (
+        email          text NOT NULL,
+        ciclo          text NOT NULL,
+        dados          jsonb NOT NULL DEFAULT '{}'::jsonb,
+        versao         integer NOT NULL DEFAULT 1,
+        atualizado_em  timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (email, ciclo)
+    );
+"""
+SQL_BUSCAR = """
+    SELECT dados, versao
+    FROM rascunhos_pdi
+    WHERE email = $1 AND ciclo = $2
+"""
+SQL_INSERIR = """
+    INSERT INTO rascunhos_pdi (email, ciclo, dados)
+    VALUES ($1, $2, $3::jsonb)
+    ON CONFLICT (email, ciclo) DO NOTHING
+    RETURNING versao
+"""
+SQL_ATUALIZAR = """
+    UPDATE rascunhos_pdi
+       SET dados = dados || $3::jsonb, versao = versao + 1, atualizado_em = now()
+     WHERE email = $1 AND ciclo = $2 AND versao = $4
+    RETURNING versao
+"""
+# sem checagem de versão: para quem só acrescenta um resultado (jobs de geração)
+SQL_MESCLAR = """
+    INSERT INTO rascunhos_pdi AS r (email, ciclo, dados)
+    VALUES ($1, $2, $3::jsonb)
+    ON CONFLICT (email, ciclo) DO UPDATE
+       SET dados = r.dados || EXCLUDED.dados, versao = r.versao + 1, atualizado_em = now()
+    RETURNING versao
+"""
+
+
+class ConflitoVersao(RuntimeError):
+    """Outra sessão gravou o rascunho depois da versão que foi lida."""
+
+
+@dataclass
+class Rascunho:
+    dados: dict = field(default_factory=dict)
+    versao: int = 0  # 0 = ainda não existe no banco
+
+
+def ciclo_atual(hoje: Optional[date] = None) -> str:
+    if PDI_CICLO:
+        return PDI_CICLO
+    hoje = hoje or date.today()
+    return f"{hoje.year}-{1 if hoje.month <= 6 else 2}"
+
+
+def _executar(dsn: str, nome: str, consulta: str, params):
+    with db.conexao(dsn) as conn:
+        db.garantir_ddl(conn, SQL_CRIAR)
+        with conn.cursor() as cur:
+            db.executar_preparado(cur, nome, consulta, params)
+            return cur.fetchone()
+
+
+def carregar(dsn: str, email: str, ciclo: str) -> Rascunho:
+    row = _executar(dsn, "pdi_rascunho_buscar", SQL_BUSCAR, (email, ciclo))
+    return Rascunho(row[0], row[1]) if row else Rascunho()
+
+
+def salvar(dsn: str, email: str, ciclo: str, alteracoes: dict, versao: int) -> int:
+    """Aplica `alteracoes` sobre o rascunho na `versao` lida; devolve a versão nova."""
+    if versao == 0:
+        row = _executar(dsn, "pdi_rascunho_inserir", SQL_INSERIR, (email, ciclo, json.dumps(alteracoes)))
+    else:
+        row = _executar(dsn, "pdi_rascunho_atualizar", SQL_ATUALIZAR,
+                        (email, ciclo, json.dumps(alteracoes), versao))
+    if row is None:
+        raise ConflitoVersao(f"Rascunho de {email} ({ciclo}) mudou depois da versão {versao}.")
+    return row[0]
+
+
+def mesclar(dsn: str, email: str, ciclo: str, alteracoes: dict) -> int:
+    """Aplica `alteracoes` sobre o que estiver gravado, qualquer que seja a versão."""
+    return _executar(dsn, "pdi_rascunho_mesclar", SQL_MESCLAR, (email, ciclo, json.dumps(alteracoes)))[0]
+
+
+def gerar_no_rascunho(dsn: str, email: str, ciclo: str, destino: str, gerar, *args, **kwargs) -> str:
+    """`gerar(*args, **kwargs)` e, se veio texto, já grava em `destino` no rascunho.
+
+    Roda no job: o resultado fica salvo mesmo que a sessão que pediu tenha caído
+    ou reconectado em outra réplica.
+    """
+    resultado = gerar(*args, **kwargs)
+    if (resultado or "").strip():
+        try:
+            mesclar(dsn, email, ciclo, {destino: resultado})
+        except Exception:
+            # a sessão ainda recebe o resultado pelo job; só não fica no rascunho
+            log.warning("Falha ao gravar %s no rascunho de %s", destino, email, exc_info=True)
+    return resultado
@@ -0,0 +1,74 @@
+import pytest
+
+import formatador_pdi
+from formatador_pdi import PDIForaDoFormato, extrair_objetivos
+
+
+def _pdi(pratica: str, outros: str = "- Mentoria quinzenal com a liderança.",
+         cursos: str = "- Curso de oratória.") -> str:
+    return f"""### Competência: Comunicação
+
+**Objetivo de Desenvolvimento**
+Comunicar decisões com clareza para o time.
+
+**70% Atividades práticas (on the job)**
+{pratica}
+
+**20% Aprendizagem com os outros**
+{outros}
+
+**10% Cursos e treinamentos**
+{cursos}
+"""
+
+
+def test_estrutura_padrao():
+    [obj] = extrair_objetivos(_pdi("- Conduzir a daily.\n- Apresentar o resultado da sprint."))
+    assert obj.nome == "Comunicação"
+    assert obj.descricao == "Comunicar decisões com clareza para o time."
+    assert obj.tarefas == [
+        "Conduzir a daily.", "Apresentar o resultado da sprint.",
+        "Mentoria quinzenal com a liderança.", "Curso de oratória.",
+    ]
+
+
+def test_introducao_antes_da_lista_e_ignorada():
+    [obj] = extrair_objetivos(_pdi("Atividades sugeridas:\n- Conduzir a daily.\n- Apresentar a sprint."))
+    assert obj.tarefas[:2] == ["Conduzir a daily.", "Apresentar a sprint."]
+
+
+def test_texto_sem_recuo_depois_do_item_continua_a_tarefa():
+    [obj] = extrair_objetivos(_pdi("1. **Conduzir a daily**\nPrazo: 30 dias.\n2. Apresentar a sprint."))
+    assert obj.tarefas[:2] == ["Conduzir a daily; Prazo: 30 dias.", "Apresentar a sprint."]
+
+
+def test_subitens_recuados_vao_para_a_tarefa():
+    [obj] = extrair_objetivos(_pdi("- Conduzir a daily\n  - Específico: 15 min\n  - Prazo: 30 dias"))
+    assert obj.tarefas[0] == "Conduzir a daily; Específico: 15 min; Prazo: 30 dias"
+
+
+def test_titulo_desconhecido_encerra_a_lista():
+    texto = _pdi("- Conduzir a daily.") + "\n**Impacto esperado no negócio**\nDecisões mais rápidas.\n"
+    [obj] = extrair_objetivos(texto)
+    assert obj.tarefas[-1] == "Curso de oratória."
+
+
+def test_paragrafo_final_apos_linha_em_branco_fica_de_fora():
+    [obj] = extrair_objetivos(_pdi("- Conduzir a daily.") + "\nBom ciclo de desenvolvimento!\n")
+    assert obj.tarefas[-1] == "Curso de oratória."
+
+
+@pytest.mark.parametrize("secao", ["pratica", "outros", "cursos"])
+def test_secao_sem_itens_e_fora_do_formato(secao):
+    partes = {"pratica": "- Conduzir a daily.", secao: "Conversar com o gestor sobre o tema."}
+    with pytest.raises(PDIForaDoFormato):
+        extrair_objetivos(_pdi(**partes))
+
+
+def test_formatar():
+    texto = formatador_pdi.formatar(extrair_objetivos(_pdi("- Conduzir a daily.")))
+    assert texto.splitlines()[:3] == [
+        "'Nome do objetivo 1': Comunicação;",
+        "'Descrição objetivo 1': Comunicar decisões com clareza para o time.;",
+        "'Tarefa 1': Conduzir a daily.;",
+    ]
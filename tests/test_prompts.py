@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+import prompts
+
+INICIO = datetime(2025, 1, 6)
+
+
+def _resumos(n: int, texto: str = "Semana de entregas. Detalhes longos sobre reuniões e tarefas do time."):
+    return [(INICIO + timedelta(weeks=i), f"{texto} ({i})") for i in range(n)]
+
+
+def _pdi(resumos, orcamento):
+    return prompts.prompt_pdi(diagnostico="Diagnóstico.", tarefas="Tarefas do cargo.", resumos=resumos,
+                              focos=["Comunicação"], orcamento=orcamento)
+
+
+def test_abaixo_do_orcamento_mantem_todas_as_semanas_na_integra():
+    p = _pdi(_resumos(10), orcamento=12000)
+    assert p.cortes == []
+    assert "(resumido)" not in p.texto
+    assert p.texto.count("Detalhes longos") == 10
+
+
+def test_acima_do_orcamento_resume_e_descarta_as_antigas():
+    p = _pdi(_resumos(10), orcamento=prompts.estimar_tokens(_pdi(_resumos(10), 12000).texto) - 20)
+    assert "semanas antigas resumidas" in p.cortes
+    assert p.texto.count("Detalhes longos") == prompts.RESUMOS_SEMANAS_INTEGRAIS
+
+
+def test_resumo_recente_com_a_palavra_resumido_nao_trava():
+    resumos = _resumos(3, texto="Relatório (resumido) da semana, sem mais detalhes.")
+    p = _pdi(resumos, orcamento=50)
+    assert p.tokens > 50  # não coube, mas a montagem terminou
+
+
+def test_bloco_sem_espacos_nao_trava():
+    p = prompts.prompt_diagnostico(
+        resumo_pessoa="x" * 5000, feedback="", pontos_fortes="a", pontos_desenvolvimento="b",
+        tarefas="c", objetivos="d", historico_bot="", resumos=[], orcamento=500,
+    )
+    assert "x" * 5000 not in p.texto